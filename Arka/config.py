@@ -18,6 +18,11 @@ class Config:
     
     # Model Configuration
     EMBEDDING_MODEL = 'BAAI/bge-small-en-v1.5'
+    EMBEDDING_STORE_DIR = os.getenv('EMBEDDING_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'embedding_store'))  # Memory-mapped vector segments
     LLM_MODEL = 'mistralai/Mistral-7B-Instruct-v0.1'
     FAQ_FILE = 'faqs.txt'
+    FAQ_TOP_K = int(os.getenv('FAQ_TOP_K', '3'))  # Q/A pairs sent to Gemini per question
+    FAQ_DIRECT_ANSWER_THRESHOLD = float(os.getenv('FAQ_DIRECT_ANSWER_THRESHOLD', '0.85'))  # Answer from the FAQ without the LLM
+    SEMANTIC_CACHE_SIZE = int(os.getenv('SEMANTIC_CACHE_SIZE', '512'))  # Generated answers kept for rephrased questions
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.92'))  # Cosine similarity counted as the same question
     
\ No newline at end of file
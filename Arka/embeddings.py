@@ -1,16 +1,152 @@
+import os
+import json
+import threading
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from config import Config
 
+try:
+    import fcntl  # Cross-process writer lock (POSIX only)
+except ImportError:
+    fcntl = None
+
 class EmbeddingGenerator:
     def __init__(self, config):
         self.model = SentenceTransformer(config.EMBEDDING_MODEL)
-        
+
     def generate_embeddings(self, texts):
         return self.model.encode(texts)
-    
+
     def save_embeddings(self, embeddings, file_path):
-        np.save(file_path, embeddings)
-        
+        np.save(file_path, np.asarray(embeddings, dtype=np.float32))
+
     def load_embeddings(self, file_path):
-        return np.load(file_path)
\ No newline at end of file
+        # Memory-mapped: pages are shared with every other process reading the same file
+        return np.load(file_path, mmap_mode='r')
+
+class EmbeddingStore:
+    """Append-only, memory-mapped vector store shared by every Arka process
+
+    Vectors live in immutable float32 .npy segments, each with a JSON list of
+    the ids of its rows. manifest.json names the committed segments and is
+    replaced atomically, so readers never see a half-written append. Segments
+    are opened with mmap_mode='r', so loading is instant and every process
+    shares the same page cache. Re-adding an id supersedes its older row.
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, directory=None):
+        self.directory = directory or Config.EMBEDDING_STORE_DIR
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.manifest_version = None  # (inode, mtime) of the manifest last loaded
+        self.segments = []  # [(name, memmap, ids, live row mask)]
+        self.locations = {}  # id -> (segment index, row)
+        self.refresh()
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_manifest(self):
+        try:
+            with open(self._path(self.MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"segments": []}
+
+    def refresh(self):
+        """Pick up segments appended by other processes (cheap when nothing changed)"""
+        try:
+            # Every commit os.replace()s the manifest, so a new inode marks a new version even within one mtime tick
+            stat = os.stat(self._path(self.MANIFEST))
+            version = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            version = None
+        if version == self.manifest_version and self.manifest_version is not None:
+            return
+
+        with self.lock:
+            known = {name: segment for name, *segment in self.segments}
+            segments = []
+            locations = {}
+            for name in self._read_manifest()["segments"]:
+                if name in known:
+                    vectors, ids, _ = known[name]
+                else:
+                    vectors = np.load(self._path(name + '.npy'), mmap_mode='r')
+                    with open(self._path(name + '.ids.json')) as f:
+                        ids = json.load(f)
+                for row, item_id in enumerate(ids):
+                    locations[item_id] = (len(segments), row)
+                segments.append([name, vectors, ids, None])
+
+            # Rows whose id was re-added in a later segment are dead
+            for index, segment in enumerate(segments):
+                segment[3] = np.fromiter((locations[item_id] == (index, row) for row, item_id in enumerate(segment[2])),
+                                         dtype=bool, count=len(segment[2]))
+
+            self.segments = [tuple(segment) for segment in segments]
+            self.locations = locations
+            self.manifest_version = version
+
+    def append(self, ids, vectors):
+        """Write a new segment and commit it; existing files are never rewritten"""
+        ids = [str(item_id) for item_id in ids]
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+        if not ids:
+            return
+
+        lock_file = open(self._path('.lock'), 'w')
+        try:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            manifest = self._read_manifest()
+            name = f"segment_{len(manifest['segments']):06d}"
+
+            # Segment files first, then the manifest: a crash leaves at worst an unreferenced segment
+            np.save(self._path(name + '.npy'), vectors)
+            with open(self._path(name + '.ids.json'), 'w') as f:
+                json.dump(ids, f)
+            manifest['segments'].append(name)
+            tmp_path = self._path(self.MANIFEST + '.tmp')
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path(self.MANIFEST))
+        finally:
+            lock_file.close()
+        self.refresh()
+
+    def __len__(self):
+        return len(self.locations)
+
+    def __contains__(self, item_id):
+        return str(item_id) in self.locations
+
+    def get(self, item_id):
+        """Vector for an id (a read-only view into the mapped file), or None"""
+        location = self.locations.get(str(item_id))
+        if location is None:
+            return None
+        segment, row = location
+        return self.segments[segment][1][row]
+
+    def search(self, query, k=5):
+        """Top-k (id, score) by dot product, scanning each mapped segment in place"""
+        self.refresh()
+        query = np.asarray(query, dtype=np.float32)
+        best_ids, best_scores = [], np.empty(0, dtype=np.float32)
+        for _, vectors, ids, live in self.segments:
+            if not len(ids):
+                continue
+            scores = np.asarray(vectors @ query)
+            scores[~live] = -np.inf
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+            best_ids.extend(ids[row] for row in top)
+            best_scores = np.concatenate([best_scores, scores[top]])
+        order = np.argsort(-best_scores)[:k]
+        return [(best_ids[i], float(best_scores[i])) for i in order if np.isfinite(best_scores[i])]
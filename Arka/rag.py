@@ -1,56 +1,191 @@
 import google.generativeai as genai
 from config import Config
+from embeddings import EmbeddingGenerator, EmbeddingStore
+import numpy as np
+import asyncio
+import hashlib
 import os
 import sys
+from collections import OrderedDict
 
 # Import the API manager
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from gemini_api_manager import api_manager
 
+class SemanticAnswerCache:
+    """LRU cache of answers keyed by question embedding rather than exact text
+
+    A question is a hit when its cosine similarity to a cached question clears
+    `threshold`, so rephrasings ("when's the deadline", "submission deadline?")
+    share one answer. Vectors sit in one preallocated matrix and a lookup is a
+    single matrix-vector product; the least recently used slot is reused when full.
+    """
+
+    def __init__(self, capacity=Config.SEMANTIC_CACHE_SIZE, threshold=Config.SEMANTIC_CACHE_THRESHOLD):
+        self.capacity = max(1, capacity)
+        self.threshold = threshold
+        self.vectors = None
+        self.answers = [None] * self.capacity
+        self.lru = OrderedDict()  # slot -> None, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.lru)
+
+    def get(self, vector):
+        """Cached answer for the most similar question above the threshold, or None"""
+        if self.lru:
+            slots = np.fromiter(self.lru, dtype=np.intp, count=len(self.lru))
+            scores = self.vectors[slots] @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                slot = int(slots[best])
+                self.lru.move_to_end(slot)
+                self.hits += 1
+                return self.answers[slot]
+        self.misses += 1
+        return None
+
+    def put(self, vector, answer):
+        if self.vectors is None:
+            self.vectors = np.zeros((self.capacity, len(vector)), dtype=np.float32)
+        if len(self.lru) < self.capacity:
+            slot = len(self.lru)
+        else:
+            slot, _ = self.lru.popitem(last=False)  # Evict the least recently used question
+        self.vectors[slot] = vector
+        self.answers[slot] = answer
+        self.lru[slot] = None
+
+    def clear(self):
+        self.lru.clear()
+        self.answers = [None] * self.capacity
+
 class RAGSystem:
     def __init__(self):
         # No need to configure genai here - API manager handles it
-        self.faqs = self._load_faqs()
+        self.embedder = EmbeddingGenerator(Config)
+        self.store = EmbeddingStore()
+        self.answer_cache = SemanticAnswerCache()
+        self.faq_path = os.path.join(os.path.dirname(__file__), Config.FAQ_FILE)
+        self.reload_lock = asyncio.Lock()
+        self._install_faq_index(self._build_faq_index())
+
+    def _faq_mtime(self):
+        try:
+            return os.stat(self.faq_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
 
     def _load_faqs(self):
         try:
-            faq_path = os.path.join(os.path.dirname(__file__), 'faqs.txt')
-            with open(faq_path, 'r', encoding='utf-8') as f:
+            with open(self.faq_path, 'r', encoding='utf-8') as f:
                 return f.read()
         except FileNotFoundError:
             return "FAQ content not available."
 
+    def _build_faq_index(self):
+        """Parse and embed the FAQ without touching the live index (safe to run in a worker thread)"""
+        faq_mtime = self._faq_mtime()
+        faqs = self._load_faqs()
+        qa_pairs = self._parse_qa_pairs(faqs)
+        # Questions drive direct answers; whole pairs drive retrieval for the LLM
+        question_vectors = self._cached_embeddings([question for question, _ in qa_pairs])
+        pair_vectors = self._cached_embeddings([f"Q: {question}\nA: {answer}" for question, answer in qa_pairs])
+        return faq_mtime, faqs, qa_pairs, question_vectors, pair_vectors
+
+    def _install_faq_index(self, index):
+        """Swap in a built index in one step; cached answers may quote the old FAQ, so they are dropped"""
+        self.faq_mtime, self.faqs, self.qa_pairs, self.question_vectors, self.pair_vectors = index
+        self.answer_cache.clear()
+
+    def _parse_qa_pairs(self, text):
+        """Split the FAQ into (question, answer) pairs; a section without Q:/A: lines becomes (heading, body)"""
+        pairs = []
+        heading, question, answer = None, None, []
+
+        def finish():
+            if question and answer:
+                pairs.append((question, "\n".join(answer).strip()))
+            elif heading and answer:
+                pairs.append((heading, "\n".join(answer).strip()))
+
+        for line in text.splitlines():
+            stripped = line.strip()
+            if stripped.startswith('#'):
+                finish()
+                heading, question, answer = stripped.lstrip('#').strip(), None, []
+            elif stripped.startswith('Q:'):
+                finish()
+                question, answer = stripped[2:].strip(), []
+            elif stripped.startswith('A:'):
+                answer.append(stripped[2:].strip())
+            elif stripped and (answer or heading):
+                answer.append(stripped)
+        finish()
+        return pairs
+
+    def _embed(self, texts):
+        """Unit-length float32 vectors, so dot products are cosine similarities"""
+        vectors = np.asarray(self.embedder.generate_embeddings(texts), dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def _cached_embeddings(self, texts):
+        """Embeddings for FAQ texts, reusing vectors already in the shared store across restarts"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        keys = [hashlib.sha1(f"{Config.EMBEDDING_MODEL}\n{text}".encode('utf-8')).hexdigest() for text in texts]
+        missing = [i for i, key in enumerate(keys) if key not in self.store]
+        if missing:
+            self.store.append([keys[i] for i in missing], self._embed([texts[i] for i in missing]))
+        return np.array([self.store.get(key) for key in keys], dtype=np.float32).reshape(len(texts), -1)
+
     async def get_answer(self, question):
+        if self._faq_mtime() != self.faq_mtime:
+            async with self.reload_lock:
+                if self._faq_mtime() != self.faq_mtime:  # Another question may have reloaded it while we waited
+                    print("🔄 faqs.txt changed - re-indexing FAQ and clearing the answer cache")
+                    # Built off the loop, installed on it, so no question sees half of each index
+                    self._install_faq_index(await asyncio.to_thread(self._build_faq_index))
+
+        # Encoding runs off the event loop so other guild events keep flowing
+        query = (await asyncio.to_thread(self._embed, [question]))[0]
+
+        if self.qa_pairs:
+            question_scores = self.question_vectors @ query
+            best_idx = int(np.argmax(question_scores))
+            if question_scores[best_idx] >= Config.FAQ_DIRECT_ANSWER_THRESHOLD:  # confidence threshold
+                return self.qa_pairs[best_idx][1]
+
+            top = np.argsort(-(self.pair_vectors @ query))[:Config.FAQ_TOP_K]
+            context = "\n\n".join(f"Q: {self.qa_pairs[i][0]}\nA: {self.qa_pairs[i][1]}" for i in top)
+        else:
+            context = self.faqs
+
         prompt = f"""
-        Based on the following FAQ document, please answer the question. 
+        Based on the following FAQ entries, please answer the question. 
         If the answer isn't directly in the FAQs, provide the most relevant information available.
         If the question is completely unrelated to the hackathon, respond with "I can only answer questions about the Global AI Hackathon."
 
-        FAQ Document:
-        {self.faqs}
+        FAQ Entries:
+        {context}
 
         Question: {question}
 
         Please provide a clear and concise answer based on the FAQ content.
         """
 
+        cached = self.answer_cache.get(query)
+        if cached is not None:
+            return cached
+
         try:
-            # Use the API manager to get a configured model with rotated key
-            model = api_manager.get_configured_model('gemini-2.0-flash-exp')
-            response = model.generate_content(prompt)
-            return response.text
+            # Runs off the event loop so other guild events keep flowing
+            faq_mtime = self.faq_mtime
+            answer = await api_manager.generate_async(prompt, 'gemini-2.0-flash-exp')
+            if self.faq_mtime == faq_mtime:  # Don't cache an answer built from an FAQ replaced meanwhile
+                self.answer_cache.put(query, answer)
+            return answer
         except Exception as e:
             return f"I apologize, but I encountered an error: {str(e)}"
-        
-        if scores[best_idx] < 0.5:  # confidence threshold
-            return "I'm not sure about that. Please ask an organizer."
-            
-        context = f"Q: {self.qa_pairs[best_idx][0]}\nA: {self.qa_pairs[best_idx][1]}"
-        
-        response = self.llm(
-            f"Based on this context: {context}\n\nQuestion: {question}\nAnswer:",
-            max_new_tokens=150,
-            temperature=0.7
-        )
-        
-        return response[0]['generated_text'].split('Answer:')[-1].strip()
\ No newline at end of file
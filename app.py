@@ -3,17 +3,23 @@ HackTwin Web Application
 Main Flask application with Outreach Agent functionality
 """
 
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for
+from flask import Flask, Response, render_template, request, jsonify, flash, redirect, url_for
 import os
+import re
 import sys
-import smtplib
+import json
+import queue
 from email.mime.text import MIMEText
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import ObjectId
+from bson.errors import InvalidId
 import google.generativeai as genai
 from dotenv import load_dotenv
 from datetime import datetime
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Add the current directory to Python path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -29,8 +35,12 @@ except ImportError as e:
 # Load environment variables
 load_dotenv()
 
-# Import the API manager
+# Import the API manager and shared SMTP pool
 from gemini_api_manager import api_manager
+from smtp_pool import smtp_pool
+from bulk_buffer import BulkWriteBuffer
+from campaign_events import campaign_events
+from skills import skill_fields
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -41,7 +51,13 @@ try:
     client = MongoClient(os.getenv("MONGODB_URI"))
     db = client["hackathon_twin"]
     users_collection = db["users"]
+    users_collection.create_index("status")  # Dashboard counts and pending-user scans
+    users_collection.create_index([("created_at", -1), ("_id", -1)])  # Keyset pagination
     campaigns_collection = db["campaigns"]  # New collection for campaign tracking
+    campaigns_collection.create_index([("created_at", -1), ("_id", -1)])
+    campaign_recipients_collection = db["campaign_recipients"]  # Per-recipient campaign checkpoints
+    campaign_recipients_collection.create_index([("campaign_id", 1), ("user_id", 1)], unique=True)
+    campaign_recipients_collection.create_index([("campaign_id", 1), ("status", 1)])
     print("✅ Successfully connected to MongoDB")
 except Exception as e:
     print(f"❌ Error connecting to MongoDB: {e}")
@@ -54,9 +70,112 @@ if MATCHMAKING_AVAILABLE:
     except Exception as e:
         print(f"⚠️  Error setting up matchmaking routes: {e}")
 
-# SMTP setup
-smtp_server = "smtp.gmail.com"
-smtp_port = 587
+# Number of invites generated per Gemini call (1 disables batching)
+OUTREACH_BATCH_SIZE = int(os.getenv("OUTREACH_BATCH_SIZE", "10"))
+
+# Production campaign pipeline: generation workers -> bounded queue -> SMTP senders -> bulk status buffer
+OUTREACH_GENERATION_WORKERS = int(os.getenv("OUTREACH_GENERATION_WORKERS", "4"))
+OUTREACH_SENDER_WORKERS = int(os.getenv("OUTREACH_SENDER_WORKERS", "2"))
+OUTREACH_SEND_QUEUE_SIZE = int(os.getenv("OUTREACH_SEND_QUEUE_SIZE", "50"))
+ALREADY_SENT_MESSAGE = "Already emailed or claimed by another campaign"
+
+# Background campaign workers. Keep at 1 so two live campaigns never pick up the same pending users.
+CAMPAIGN_WORKERS = int(os.getenv("CAMPAIGN_WORKERS", "1"))
+
+# How long dashboard user counts are reused before re-aggregating (seconds)
+DASHBOARD_STATS_TTL = float(os.getenv("DASHBOARD_STATS_TTL", "5"))
+dashboard_stats_lock = threading.Lock()
+dashboard_stats_cache = {"counts": None, "expires_at": 0.0}
+
+def get_user_status_counts():
+    """Total and per-status user counts from a single aggregation, cached briefly"""
+    with dashboard_stats_lock:
+        if dashboard_stats_cache["counts"] is not None and time.monotonic() < dashboard_stats_cache["expires_at"]:
+            return dashboard_stats_cache["counts"]
+    
+    by_status = {
+        row["_id"]: row["count"]
+        for row in users_collection.aggregate([
+            # Sorting on the indexed field and projecting only it makes this a covered index scan
+            {"$sort": {"status": 1}},
+            {"$project": {"_id": 0, "status": 1}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ])
+    }
+    counts = {
+        "total_users": sum(by_status.values()),
+        "pending_users": by_status.get("PENDING", 0),
+        "sent_users": by_status.get("SENT", 0),
+        "error_users": by_status.get("ERROR", 0)
+    }
+    
+    with dashboard_stats_lock:
+        dashboard_stats_cache["counts"] = counts
+        dashboard_stats_cache["expires_at"] = time.monotonic() + DASHBOARD_STATS_TTL
+    return counts
+
+def invalidate_user_status_counts():
+    """Drop cached dashboard counts after user statuses change"""
+    with dashboard_stats_lock:
+        dashboard_stats_cache["counts"] = None
+
+# List pages show this many rows unless ?page_size= asks otherwise (capped at MAX_PAGE_SIZE)
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# Fields each list page actually renders
+USERS_PAGE_FIELDS = {"name": 1, "email": 1, "job_title": 1, "keywords": 1, "status": 1,
+                     "sent_at": 1, "error_message": 1, "created_at": 1}
+OUTREACH_PAGE_FIELDS = {"name": 1, "email": 1, "job_title": 1, "keywords": 1, "status": 1, "created_at": 1}
+CAMPAIGNS_PAGE_FIELDS = {"created_at": 1, "completed_at": 1, "total_users": 1, "sent": 1, "failed": 1,
+                         "test_mode": 1, "status": 1}
+
+def encode_page_cursor(document):
+    """Opaque cursor pointing just past a document in (created_at, _id) descending order"""
+    created_at = document.get("created_at")
+    return f"{created_at.isoformat() if created_at else ''}_{document['_id']}"
+
+def decode_page_cursor(cursor):
+    """Inverse of encode_page_cursor; returns None for a missing or malformed cursor"""
+    try:
+        created_at, _, document_id = cursor.rpartition("_")
+        return (datetime.fromisoformat(created_at) if created_at else None), ObjectId(document_id)
+    except (AttributeError, ValueError, TypeError, InvalidId):
+        return None
+
+def paginate(collection, projection, after=None, page_size=None):
+    """One page of newest-first documents using keyset pagination on (created_at, _id)
+    
+    Returns the page and the cursor for the next one (None on the last page).
+    Each page is a bounded index range scan, however deep into the collection it is.
+    """
+    page_size = min(max(1, page_size or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+    
+    query = {}
+    position = decode_page_cursor(after)
+    if position:
+        created_at, document_id = position
+        if created_at is None:
+            # Documents without a timestamp sort last; page through them by _id alone
+            query = {"created_at": None, "_id": {"$lt": document_id}}
+        else:
+            query = {"$or": [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": document_id}},
+                {"created_at": None}
+            ]}
+    
+    documents = list(
+        collection.find(query, projection)
+        .sort([("created_at", -1), ("_id", -1)])
+        .limit(page_size + 1)
+    )
+    next_cursor = encode_page_cursor(documents[page_size - 1]) if len(documents) > page_size else None
+    return documents[:page_size], next_cursor
+
+def page_request_args():
+    """Cursor and page size from the query string"""
+    return request.args.get("after"), request.args.get("page_size", type=int)
 
 class OutreachAgent:
     """Outreach Agent class for managing email campaigns"""
@@ -64,6 +183,12 @@ class OutreachAgent:
     def __init__(self):
         self.sender_email = os.getenv("SENDER_EMAIL")
         self.sender_password = os.getenv("SENDER_PASSWORD")
+        
+        # Campaigns run here so HTTP requests return immediately
+        self.campaign_executor = ThreadPoolExecutor(max_workers=max(1, CAMPAIGN_WORKERS),
+                                                    thread_name_prefix="campaign")
+        self.active_lock = threading.Lock()
+        self.active_campaigns = set()  # Campaign ids queued or running in this process
     
     def insert_sample_users(self):
         """Insert sample users if none exist"""
@@ -95,7 +220,10 @@ class OutreachAgent:
                     "created_at": datetime.utcnow()
                 }
             ]
+            for user in sample_users:
+                user.update(skill_fields(user["keywords"]))
             users_collection.insert_many(sample_users)
+            invalidate_user_status_counts()
             return len(sample_users)
         return existing_count
     
@@ -118,23 +246,21 @@ class OutreachAgent:
         """
         
         try:
-            # Enhanced rate limiting with distributed API keys
             print(f"🤖 Generating email for {user_data['name']}...")
-            print("⏳ Applying rate limiting with key rotation (5 seconds)...")
-            time.sleep(5)  # Reduced delay since we have multiple keys
             
-            # Use the API manager to get a configured model with rotated key
-            model = api_manager.get_configured_model("gemini-2.0-flash-exp")
-            response = model.generate_content(prompt)
+            # The API manager blocks only until a key has rate-limit capacity
+            email_content = api_manager.generate(prompt, "gemini-2.0-flash-exp")
             
             print(f"✅ Email generated successfully for {user_data['name']}")
-            return response.text
+            return email_content
         except Exception as e:
             print(f"❌ Error generating email content for {user_data['name']}: {e}")
             print(f"⚠️  Using fallback template instead...")
-            
-            # Return fallback template
-            return f"""Dear {user_data['name']},
+            return self.fallback_email(user_data)
+    
+    def fallback_email(self, user_data):
+        """Template invite used when Gemini is unavailable"""
+        return f"""Dear {user_data['name']},
 
 We're excited to invite you to the Hack-Nation Global AI Hackathon! 
 
@@ -149,115 +275,576 @@ Ready to hack the future? Register now at: https://hack-nation.ai/
 Best regards,
 The Hack-Nation Team"""
     
-    def send_campaign(self, test_mode=True):
-        """Send email campaign"""
-        # Insert sample users if none exist
-        self.insert_sample_users()
+    def generate_personalized_emails_batch(self, users):
+        """Generate invites for several users with ONE Gemini call
         
-        # Get pending users
-        users = list(users_collection.find({"status": {"$ne": "SENT"}}))
+        Returns the email bodies in the same order as `users`. Any user whose
+        entry is missing or malformed in the model output is generated individually.
+        """
+        if len(users) == 1:
+            return [self.generate_personalized_email(users[0])]
         
-        if not users:
-            return {"success": False, "message": "No users found to send emails to."}
+        profiles = [
+            {
+                "id": index,
+                "name": user["name"],
+                "job_title": user["job_title"],
+                "keywords": user["keywords"]
+            }
+            for index, user in enumerate(users)
+        ]
         
-        campaign_id = campaigns_collection.insert_one({
-            "created_at": datetime.utcnow(),
-            "total_users": len(users),
-            "test_mode": test_mode,
-            "status": "RUNNING"
-        }).inserted_id
+        prompt = f"""
+        Generate personalized email invites for the Hack-Nation Global AI Hackathon, one per recipient below.
         
-        results = {
-            "campaign_id": str(campaign_id),
-            "total_users": len(users),
-            "sent": 0,
-            "failed": 0,
-            "emails": []
+        Recipients (JSON):
+        {json.dumps(profiles, ensure_ascii=False)}
+        
+        Structure EACH email as follows:
+        1. Greeting: Personalized and friendly, e.g., "Dear <name>,"
+        2. Introduction: Briefly introduce Hack-Nation and the hackathon's mission (experiment with AI, build bridges, launch ventures).
+        3. Personalization: Highlight how the recipient's job title and keywords make them a great fit, and mention AI-powered team matchmaking.
+        4. Call to Action: Encourage them to join with the registration link: https://hack-nation.ai/
+        5. Community: Invite them to join our Discord community for networking and updates: https://discord.gg/cq7DPV67
+        6. Closing: Warm sign-off from the Hack-Nation team.
+        
+        IMPORTANT: Every email must include both the registration link https://hack-nation.ai/ and Discord invite https://discord.gg/cq7DPV67.
+        Keep each email concise (under 150 words), engaging, and professional.
+        
+        Return ONLY a JSON array with exactly {len(users)} objects of the form {{"id": <recipient id>, "email": "<email body>"}}, no explanations or additional text.
+        """
+        
+        emails = {}
+        try:
+            print(f"🤖 Generating {len(users)} emails in one batch...")
+            response_text = api_manager.generate(prompt, "gemini-2.0-flash-exp")
+            emails = self._parse_batch_emails(response_text, len(users))
+            print(f"✅ Batch returned {len(emails)}/{len(users)} valid emails")
+        except Exception as e:
+            print(f"❌ Error generating email batch: {e}")
+        
+        results = []
+        for index, user in enumerate(users):
+            if index in emails:
+                results.append(emails[index])
+            else:
+                print(f"🔁 Retrying {user['name']} individually...")
+                results.append(self.generate_personalized_email(user))
+        return results
+    
+    def _parse_batch_emails(self, response_text, expected_count):
+        """Parse the batch JSON array into {id: email}, skipping invalid entries"""
+        # Models often wrap JSON in a ```json code fence
+        text = re.sub(r"^```(?:json)?\s*|\s*```$", "", response_text.strip())
+        try:
+            entries = json.loads(text)
+        except json.JSONDecodeError as e:
+            print(f"⚠️  Batch response is not valid JSON: {e}")
+            return {}
+        
+        if not isinstance(entries, list):
+            print("⚠️  Batch response is not a JSON array")
+            return {}
+        
+        emails = {}
+        for entry in entries:
+            if not isinstance(entry, dict):
+                continue
+            index = entry.get("id")
+            body = entry.get("email")
+            if (isinstance(index, int) and 0 <= index < expected_count and index not in emails
+                    and isinstance(body, str) and "https://hack-nation.ai/" in body):
+                emails[index] = body.strip()
+        return emails
+    
+    def _send_invite(self, recipient, email_content):
+        """Send one generated invite
+        
+        Returns the recipient's final status and the per-recipient result record.
+        """
+        try:
+            if isinstance(email_content, Exception):
+                raise email_content
+            
+            msg = MIMEText(email_content)
+            msg["Subject"] = f"Join Hack-Nation's Global AI Hackathon, {recipient['name']}!"
+            msg["From"] = self.sender_email
+            msg["To"] = recipient["email"]
+            
+            smtp_pool.send_message(msg)
+            
+            return "SENT", {
+                "name": recipient["name"],
+                "email": recipient["email"],
+                "status": "SENT"
+            }
+            
+        except Exception as e:
+            return "ERROR", {
+                "name": recipient["name"],
+                "email": recipient["email"],
+                "error": str(e),
+                "status": "ERROR"
+            }
+    
+    def _record_progress(self, campaign_id, sent, failed):
+        """Increment a running campaign's progress counters"""
+        campaigns_collection.update_one(
+            {"_id": campaign_id},
+            {"$inc": {"processed": sent + failed, "sent": sent, "failed": failed}}
+        )
+    
+    def _sync_progress(self, campaign_id, test_mode):
+        """Recompute a campaign's counters from its recipient checkpoints"""
+        counts = {
+            row["_id"]: row["count"]
+            for row in campaign_recipients_collection.aggregate([
+                {"$match": {"campaign_id": campaign_id}},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+            ])
+        }
+        progress = {
+            "total_users": sum(counts.values()),
+            "sent": counts.get("GENERATED" if test_mode else "SENT", 0),
+            "failed": counts.get("ERROR", 0),
+            "skipped": counts.get("SKIPPED", 0)
         }
+        progress["processed"] = progress["sent"] + progress["failed"]
+        campaigns_collection.update_one({"_id": campaign_id}, {"$set": progress})
+        return progress
+    
+    def _snapshot_recipients(self, campaign_id):
+        """Checkpoint who this campaign targets, once, so a resume sees the same users"""
+        campaign = campaigns_collection.find_one({"_id": campaign_id}, {"recipients_ready": 1})
+        if campaign.get("recipients_ready"):
+            return
+        
+        users = users_collection.find(
+            {"status": {"$ne": "SENT"}},
+            {"name": 1, "email": 1, "job_title": 1, "keywords": 1}
+        )
+        recipients = [
+            {
+                "campaign_id": campaign_id,
+                "user_id": user["_id"],
+                "name": user["name"],
+                "email": user["email"],
+                "job_title": user.get("job_title", ""),
+                "keywords": user.get("keywords", []),
+                "status": "PENDING"
+            }
+            for user in users
+        ]
+        if recipients:
+            try:
+                campaign_recipients_collection.insert_many(recipients, ordered=False)
+            except BulkWriteError:
+                pass  # Rows left by an interrupted snapshot hit the unique index - keep them
+        campaigns_collection.update_one({"_id": campaign_id}, {"$set": {"recipients_ready": True}})
+    
+    def _claim_recipients(self, campaign_id, recipients):
+        """Claim the recipients' users for this campaign, one batch at a time
+        
+        A user already SENT or claimed by another campaign is not emailed again:
+        their recipient row is marked SKIPPED. Returns the recipients this
+        campaign owns. Claims are released when the user's final status is
+        written, or by _release_claims for anyone left unsent.
+        """
+        if not recipients:
+            return recipients
+        user_ids = [recipient["user_id"] for recipient in recipients]
+        users_collection.update_many(
+            {"_id": {"$in": user_ids}, "status": {"$ne": "SENT"}, "claimed_by": {"$exists": False}},
+            {"$set": {"claimed_by": campaign_id}}
+        )
+        owned = set(users_collection.distinct(
+            "_id", {"_id": {"$in": user_ids}, "status": {"$ne": "SENT"}, "claimed_by": campaign_id}
+        ))
+        skipped = [recipient["_id"] for recipient in recipients if recipient["user_id"] not in owned]
+        if skipped:
+            campaign_recipients_collection.update_many(
+                {"_id": {"$in": skipped}},
+                {"$set": {"status": "SKIPPED", "error_message": ALREADY_SENT_MESSAGE}}
+            )
+        return [recipient for recipient in recipients if recipient["user_id"] in owned]
+    
+    def _release_claims(self, campaign_id, statuses):
+        """Let other campaigns email users whose recipient row is in one of `statuses`"""
+        user_ids = campaign_recipients_collection.distinct(
+            "user_id", {"campaign_id": campaign_id, "status": {"$in": statuses}}
+        )
+        if user_ids:
+            users_collection.update_many(
+                {"_id": {"$in": user_ids}, "claimed_by": campaign_id},
+                {"$unset": {"claimed_by": ""}}
+            )
+    
+    def _checkpoint_generated(self, campaign_id, batch, batch_contents):
+        """Persist generated emails so a resumed campaign never regenerates them"""
+        operations = []
+        for recipient, email_content in zip(batch, batch_contents):
+            if isinstance(email_content, Exception):
+                update = {"status": "ERROR", "error_message": str(email_content)}
+            else:
+                update = {"status": "GENERATED", "content": email_content}
+            operations.append(UpdateOne({"_id": recipient["_id"]}, {"$set": update}))
+        if operations:
+            campaign_recipients_collection.bulk_write(operations, ordered=False)
+    
+    def _run_test_generation(self, campaign_id, batch_size):
+        """Generate every pending invite, checkpointing each batch"""
+        pending = list(campaign_recipients_collection.find({"campaign_id": campaign_id, "status": "PENDING"}))
+        
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            try:
+                batch_contents = self.generate_personalized_emails_batch(batch)
+            except Exception as e:
+                batch_contents = [e] * len(batch)
+            self._checkpoint_generated(campaign_id, batch, batch_contents)
+            
+            batch_sent = 0
+            for recipient, email_content in zip(batch, batch_contents):
+                # Generated bodies are streamed to live viewers and kept only in the checkpoint
+                if isinstance(email_content, Exception):
+                    campaign_events.publish(campaign_id, "recipient",
+                                            name=recipient["name"], email=recipient["email"],
+                                            error=str(email_content), status="ERROR")
+                else:
+                    campaign_events.publish(campaign_id, "recipient",
+                                            name=recipient["name"], email=recipient["email"],
+                                            content=email_content, status="GENERATED")
+                    batch_sent += 1
+            self._record_progress(campaign_id, batch_sent, len(batch) - batch_sent)
+    
+    def _run_send_pipeline(self, campaign_id, batch_size):
+        """Generate and send invites concurrently
+        
+        Generation workers (throttled by the API key rate limiter) feed a bounded
+        queue drained by SMTP sender workers sharing the connection pool, whose
+        status updates are buffered and written to Mongo with bulk_write. The
+        bounded queue applies backpressure so generation never runs far ahead of sending.
         
-        if test_mode:
-            # Test mode - generate emails without sending
-            for user in users:
+        Recipients already GENERATED by an earlier run go straight to the senders.
+        Each recipient is checkpointed as SENDING before its email goes out, so a
+        recipient interrupted mid-send is marked ERROR on resume instead of resent.
+        Users are claimed a batch at a time before generation, so anyone another
+        campaign already emailed (or is about to) is SKIPPED rather than mailed twice.
+        
+        Workers survive errors so the queues always drain; errors are collected
+        and raised once the pipeline has stopped.
+        """
+        sender_count = max(1, OUTREACH_SENDER_WORKERS)
+        
+        # Fail fast, like the sequential version, if SMTP is unreachable
+        try:
+            smtp_pool.warm_up(sender_count)
+        except Exception as e:
+            raise RuntimeError(f"SMTP connection error: {str(e)}") from e
+        
+        interrupted_message = "Interrupted while sending; not retried to avoid a duplicate email"
+        interrupted_users = campaign_recipients_collection.distinct(
+            "user_id", {"campaign_id": campaign_id, "status": "SENDING"}
+        )
+        if interrupted_users:
+            campaign_recipients_collection.update_many(
+                {"campaign_id": campaign_id, "status": "SENDING"},
+                {"$set": {"status": "ERROR", "error_message": interrupted_message}}
+            )
+            users_collection.update_many(
+                {"_id": {"$in": interrupted_users}, "status": {"$ne": "SENT"}, "claimed_by": campaign_id},
+                {"$set": {"status": "ERROR", "error_message": interrupted_message}, "$unset": {"claimed_by": ""}}
+            )
+            invalidate_user_status_counts()
+        
+        batch_queue = queue.Queue()
+        for status in ("GENERATED", "PENDING"):
+            recipients = list(campaign_recipients_collection.find({"campaign_id": campaign_id, "status": status}))
+            for start in range(0, len(recipients), batch_size):
+                batch_queue.put(recipients[start:start + batch_size])
+        send_queue = queue.Queue(maxsize=OUTREACH_SEND_QUEUE_SIZE)
+        worker_errors = []
+        
+        def record_worker_error(role, error):
+            print(f"❌ Campaign {campaign_id} {role} error: {error}")
+            worker_errors.append(f"{role}: {error}")
+        
+        def generation_worker():
+            while True:
+                try:
+                    batch = batch_queue.get_nowait()
+                except queue.Empty:
+                    return
                 try:
-                    email_content = self.generate_personalized_email(user)
-                    results["emails"].append({
-                        "name": user["name"],
-                        "email": user["email"],
-                        "content": email_content,
-                        "status": "GENERATED"
-                    })
-                    results["sent"] += 1
+                    batch = self._claim_recipients(campaign_id, batch)
+                    if not batch:
+                        continue
+                    if batch[0]["status"] == "GENERATED":
+                        batch_contents = [recipient["content"] for recipient in batch]
+                    else:
+                        try:
+                            batch_contents = self.generate_personalized_emails_batch(batch)
+                        except Exception as e:
+                            batch_contents = [e] * len(batch)
+                        self._checkpoint_generated(campaign_id, batch, batch_contents)
                 except Exception as e:
-                    results["emails"].append({
-                        "name": user["name"],
-                        "email": user["email"],
-                        "error": str(e),
-                        "status": "ERROR"
-                    })
-                    results["failed"] += 1
-        else:
-            # Production mode - actually send emails
-            if not self.sender_email or not self.sender_password:
-                return {"success": False, "message": "Email credentials not configured"}
+                    record_worker_error("generator", e)  # Batch stays outstanding for a resume
+                    continue
+                for recipient, email_content in zip(batch, batch_contents):
+                    send_queue.put((recipient, email_content))  # Blocks while senders catch up
+        
+        def sender_worker():
+            while True:
+                items = [send_queue.get()]
+                # Take whatever else is ready (stopping at a shutdown marker) to checkpoint together
+                while items[-1] is not None and len(items) < OUTREACH_SEND_QUEUE_SIZE:
+                    try:
+                        items.append(send_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = items[-1] is None
+                items = [item for item in items if item is not None]
+                
+                try:
+                    if items:
+                        campaign_recipients_collection.update_many(
+                            {"_id": {"$in": [recipient["_id"] for recipient, _ in items]}},
+                            {"$set": {"status": "SENDING"}}
+                        )
+                    for recipient, email_content in items:
+                        status, record = self._send_invite(recipient, email_content)
+                        status_buffer.add((recipient, status, record.get("error")))
+                        campaign_events.publish(campaign_id, "recipient", **record)
+                except Exception as e:
+                    record_worker_error("sender", e)  # Keep draining so generators never block
+                if stop:
+                    return
+        
+        def write_statuses(updates):
+            user_operations = []
+            recipient_operations = []
+            for recipient, status, error in updates:
+                if status == "SENT":
+                    user_update = {"status": "SENT", "sent_at": datetime.utcnow()}
+                    recipient_update = {"status": "SENT"}
+                else:
+                    user_update = {"status": "ERROR", "error_message": error}
+                    recipient_update = {"status": "ERROR", "error_message": error}
+                # The final status ends this campaign's claim on the user
+                user_operations.append(UpdateOne({"_id": recipient["user_id"]},
+                                                 {"$set": user_update, "$unset": {"claimed_by": ""}}))
+                recipient_operations.append(UpdateOne({"_id": recipient["_id"]}, {"$set": recipient_update}))
+            
+            users_collection.bulk_write(user_operations, ordered=False)
+            invalidate_user_status_counts()
+            campaign_recipients_collection.bulk_write(recipient_operations, ordered=False)
+            sent = sum(1 for _, status, _ in updates if status == "SENT")
+            failed = sum(1 for _, status, _ in updates if status == "ERROR")
+            self._record_progress(campaign_id, sent, failed)
+        
+        status_buffer = BulkWriteBuffer(write_statuses)
+        senders = [threading.Thread(target=sender_worker, daemon=True) for _ in range(sender_count)]
+        generators = [threading.Thread(target=generation_worker, daemon=True)
+                      for _ in range(max(1, OUTREACH_GENERATION_WORKERS))]
+        
+        try:
+            for thread in senders + generators:
+                thread.start()
             
+            for thread in generators:
+                thread.join()
+            for _ in senders:
+                send_queue.put(None)
+            for thread in senders:
+                thread.join()
+        finally:
             try:
-                with smtplib.SMTP(smtp_server, smtp_port) as server:
-                    server.starttls()
-                    server.login(self.sender_email, self.sender_password)
-                    
-                    for user in users:
-                        try:
-                            email_content = self.generate_personalized_email(user)
-                            
-                            msg = MIMEText(email_content)
-                            msg["Subject"] = f"Join Hack-Nation's Global AI Hackathon, {user['name']}!"
-                            msg["From"] = self.sender_email
-                            msg["To"] = user["email"]
-                            
-                            server.send_message(msg)
-                            
-                            # Update user status
-                            users_collection.update_one(
-                                {"_id": user["_id"]},
-                                {"$set": {"status": "SENT", "sent_at": datetime.utcnow()}}
-                            )
-                            
-                            results["emails"].append({
-                                "name": user["name"],
-                                "email": user["email"],
-                                "status": "SENT"
-                            })
-                            results["sent"] += 1
-                            
-                        except Exception as e:
-                            users_collection.update_one(
-                                {"_id": user["_id"]},
-                                {"$set": {"status": "ERROR", "error_message": str(e)}}
-                            )
-                            results["emails"].append({
-                                "name": user["name"],
-                                "email": user["email"],
-                                "error": str(e),
-                                "status": "ERROR"
-                            })
-                            results["failed"] += 1
-                            
-            except Exception as e:
-                return {"success": False, "message": f"SMTP connection error: {str(e)}"}
+                status_buffer.close()  # Final flush, even if the pipeline is interrupted
+            finally:
+                # Recipients never attempted go back to the pool; SENDING ones stay claimed until a resume
+                self._release_claims(campaign_id, ["PENDING", "GENERATED"])
+        print(f"🗃️  Wrote {status_buffer.flushed_items} status updates in {status_buffer.flushes} bulk writes")
+        if worker_errors:
+            raise RuntimeError(f"{len(worker_errors)} pipeline error(s); first: {worker_errors[0]}")
+    
+    def create_campaign(self, test_mode=True):
+        """Record a new QUEUED campaign; returns its id, or None if nobody is pending"""
+        # Insert sample users if none exist
+        self.insert_sample_users()
+        
+        total_users = users_collection.count_documents({"status": {"$ne": "SENT"}})
+        if total_users == 0:
+            return None
+        
+        return campaigns_collection.insert_one({
+            "created_at": datetime.utcnow(),
+            "total_users": total_users,
+            "test_mode": test_mode,
+            "status": "QUEUED",
+            "processed": 0,
+            "sent": 0,
+            "failed": 0
+        }).inserted_id
+    
+    def _submit(self, campaign_id, test_mode, batch_size):
+        """Hand a campaign to the background worker unless it is already queued/running"""
+        with self.active_lock:
+            if str(campaign_id) in self.active_campaigns:
+                return False
+            self.active_campaigns.add(str(campaign_id))
+        # Before submitting, so this can never overwrite the worker's RUNNING status
+        campaigns_collection.update_one({"_id": campaign_id}, {"$set": {"status": "QUEUED"},
+                                                              "$unset": {"error_message": ""}})
+        self.campaign_executor.submit(self.run_campaign, campaign_id, test_mode, batch_size)
+        return True
+    
+    def enqueue_campaign(self, test_mode=True, batch_size=None):
+        """Create a campaign and run it on the background worker"""
+        if not test_mode and (not self.sender_email or not self.sender_password):
+            return {"success": False, "message": "Email credentials not configured"}
+        
+        campaign_id = self.create_campaign(test_mode)
+        if campaign_id is None:
+            return {"success": False, "message": "No users found to send emails to."}
+        
+        self._submit(campaign_id, test_mode, batch_size)
+        print(f"📥 Queued {'test' if test_mode else 'live'} campaign {campaign_id}")
+        return {"success": True, "campaign_id": str(campaign_id), "status": "QUEUED"}
+    
+    def resume_campaign(self, campaign_id, batch_size=None):
+        """Re-queue an interrupted campaign from its recipient checkpoints"""
+        if not ObjectId.is_valid(campaign_id):
+            return {"success": False, "message": "Campaign not found"}
+        campaign_id = ObjectId(campaign_id)
+        campaign = campaigns_collection.find_one({"_id": campaign_id})
+        if not campaign:
+            return {"success": False, "message": "Campaign not found"}
+        if campaign.get("status") == "COMPLETED":
+            return {"success": False, "message": "Campaign already completed"}
+        
+        test_mode = campaign.get("test_mode", False)
+        if not test_mode and (not self.sender_email or not self.sender_password):
+            return {"success": False, "message": "Email credentials not configured"}
+        
+        if not self._submit(campaign_id, test_mode, batch_size):
+            return {"success": False, "message": "Campaign is already running"}
+        
+        print(f"♻️  Resuming campaign {campaign_id}")
+        return {"success": True, "campaign_id": str(campaign_id), "status": "QUEUED"}
+    
+    def send_campaign(self, test_mode=True, batch_size=None):
+        """Send email campaign synchronously (blocks until it finishes)"""
+        if not test_mode and (not self.sender_email or not self.sender_password):
+            return {"success": False, "message": "Email credentials not configured"}
+        
+        campaign_id = self.create_campaign(test_mode)
+        if campaign_id is None:
+            return {"success": False, "message": "No users found to send emails to."}
+        
+        return self.run_campaign(campaign_id, test_mode, batch_size)
+    
+    def run_campaign(self, campaign_id, test_mode=True, batch_size=None):
+        """Generate (and in production, send) every outstanding invite of a campaign
+        
+        Safe to call again on an interrupted campaign: recipients already generated
+        are not regenerated and recipients already sent are not sent again.
+        """
+        batch_size = max(1, batch_size or OUTREACH_BATCH_SIZE)
+        
+        try:
+            self._snapshot_recipients(campaign_id)
+            self._sync_progress(campaign_id, test_mode)
+            campaigns_collection.update_one(
+                {"_id": campaign_id},
+                {"$set": {"status": "RUNNING", "started_at": datetime.utcnow()}}
+            )
+            
+            if test_mode:
+                # Test mode - generate emails without sending
+                self._run_test_generation(campaign_id, batch_size)
+            else:
+                # Production mode - actually send emails
+                self._run_send_pipeline(campaign_id, batch_size)
+            
+            progress = self._sync_progress(campaign_id, test_mode)
+            outstanding = campaign_recipients_collection.count_documents({
+                "campaign_id": campaign_id,
+                "status": {"$in": ["PENDING"] if test_mode else ["PENDING", "GENERATED", "SENDING"]}
+            })
+            if outstanding:
+                raise RuntimeError(f"{outstanding} recipients were not processed; resume the campaign to retry")
+        except Exception as e:
+            print(f"❌ Campaign {campaign_id} failed: {e}")
+            campaigns_collection.update_one(
+                {"_id": campaign_id},
+                {"$set": {"status": "FAILED", "completed_at": datetime.utcnow(), "error_message": str(e)}}
+            )
+            campaign_events.publish(campaign_id, "done", status="FAILED", error_message=str(e))
+            return {"success": False, "campaign_id": str(campaign_id), "message": str(e)}
+        finally:
+            with self.active_lock:
+                self.active_campaigns.discard(str(campaign_id))
         
         # Update campaign status
         campaigns_collection.update_one(
             {"_id": campaign_id},
-            {"$set": {
-                "status": "COMPLETED",
-                "completed_at": datetime.utcnow(),
-                "sent": results["sent"],
-                "failed": results["failed"]
-            }}
+            {"$set": {"status": "COMPLETED", "completed_at": datetime.utcnow()}}
         )
         
+        results = {
+            "campaign_id": str(campaign_id),
+            "total_users": progress["total_users"],
+            "sent": progress["sent"],
+            "failed": progress["failed"]
+        }
+        campaign_events.publish(campaign_id, "done", status="COMPLETED", **results)
+        
         results["success"] = True
         return results
+    
+    def get_campaign_status(self, campaign_id):
+        """Progress of a campaign as recorded in the campaigns collection"""
+        if not ObjectId.is_valid(campaign_id):
+            return None
+        campaign = campaigns_collection.find_one({"_id": ObjectId(campaign_id)})
+        if not campaign:
+            return None
+        
+        status = {
+            "success": True,
+            "campaign_id": str(campaign["_id"]),
+            "status": campaign.get("status"),
+            "test_mode": campaign.get("test_mode", False),
+            "total_users": campaign.get("total_users", 0),
+            "processed": campaign.get("processed", 0),
+            "sent": campaign.get("sent", 0),
+            "failed": campaign.get("failed", 0),
+            "skipped": campaign.get("skipped", 0),
+            "error_message": campaign.get("error_message")
+        }
+        return status
+    
+    def get_campaign_recipients(self, campaign_id, status=None, limit=100):
+        """Checkpointed recipients of a campaign (including generated test emails)"""
+        if not ObjectId.is_valid(campaign_id):
+            return None
+        query = {"campaign_id": ObjectId(campaign_id)}
+        if status:
+            query["status"] = status
+        recipients = campaign_recipients_collection.find(
+            query,
+            {"name": 1, "email": 1, "status": 1, "content": 1, "error_message": 1}
+        ).limit(limit)
+        return [
+            {
+                "name": recipient["name"],
+                "email": recipient["email"],
+                "status": recipient["status"],
+                "content": recipient.get("content"),
+                "error": recipient.get("error_message")
+            }
+            for recipient in recipients
+        ]
 
 # Initialize the outreach agent
 outreach_agent = OutreachAgent()
@@ -267,47 +854,106 @@ outreach_agent = OutreachAgent()
 def index():
     """Main dashboard"""
     # Get stats
-    total_users = users_collection.count_documents({})
-    pending_users = users_collection.count_documents({"status": "PENDING"})
-    sent_users = users_collection.count_documents({"status": "SENT"})
-    error_users = users_collection.count_documents({"status": "ERROR"})
-    
-    recent_campaigns = list(campaigns_collection.find().sort("created_at", -1).limit(5))
-    
-    stats = {
-        "total_users": total_users,
-        "pending_users": pending_users,
-        "sent_users": sent_users,
-        "error_users": error_users,
-        "recent_campaigns": recent_campaigns
-    }
+    stats = dict(get_user_status_counts())
+    stats["recent_campaigns"], _ = paginate(campaigns_collection, CAMPAIGNS_PAGE_FIELDS, page_size=5)
     
     return render_template('dashboard.html', stats=stats)
 
 @app.route('/outreach')
 def outreach():
     """Outreach Agent page"""
-    users = list(users_collection.find().sort("created_at", -1))
-    return render_template('outreach.html', users=users)
+    after, page_size = page_request_args()
+    users, next_cursor = paginate(users_collection, OUTREACH_PAGE_FIELDS, after, page_size)
+    return render_template('outreach.html', users=users, total_users=get_user_status_counts()["total_users"],
+                           next_cursor=next_cursor, page_size=page_size)
 
 @app.route('/api/campaign/test', methods=['POST'])
 def test_campaign():
-    """Run test campaign (generate emails without sending)"""
+    """Queue test campaign (generate emails without sending)"""
     try:
-        results = outreach_agent.send_campaign(test_mode=True)
-        return jsonify(results)
+        results = outreach_agent.enqueue_campaign(test_mode=True)
+        return jsonify(results), 202 if results["success"] else 200
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
 @app.route('/api/campaign/send', methods=['POST'])
 def send_campaign():
-    """Send actual email campaign"""
+    """Queue actual email campaign"""
+    try:
+        results = outreach_agent.enqueue_campaign(test_mode=False)
+        return jsonify(results), 202 if results["success"] else 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route('/api/campaign/<campaign_id>/status')
+def campaign_status(campaign_id):
+    """Progress of a queued or running campaign"""
+    try:
+        status = outreach_agent.get_campaign_status(campaign_id)
+        if status is None:
+            return jsonify({"success": False, "message": "Campaign not found"}), 404
+        return jsonify(status)
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route('/api/campaign/<campaign_id>/resume', methods=['POST'])
+def resume_campaign(campaign_id):
+    """Resume an interrupted campaign from its checkpoints"""
+    try:
+        results = outreach_agent.resume_campaign(campaign_id)
+        return jsonify(results), 202 if results["success"] else 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
+@app.route('/api/campaign/<campaign_id>/recipients')
+def campaign_recipients(campaign_id):
+    """Per-recipient checkpoints of a campaign, optionally filtered by status"""
     try:
-        results = outreach_agent.send_campaign(test_mode=False)
-        return jsonify(results)
+        limit = min(max(1, int(request.args.get('limit', 100))), 1000)
+        recipients = outreach_agent.get_campaign_recipients(campaign_id, request.args.get('status'), limit)
+        if recipients is None:
+            return jsonify({"success": False, "message": "Campaign not found"}), 404
+        return jsonify({"success": True, "recipients": recipients})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route('/api/campaign/<campaign_id>/events')
+def campaign_event_stream(campaign_id):
+    """Server-Sent Events stream of per-recipient campaign progress"""
+    # Subscribe before reading the status so no event slips in between
+    subscription = campaign_events.subscribe(campaign_id)
+    status = outreach_agent.get_campaign_status(campaign_id)
+    if status is None:
+        campaign_events.unsubscribe(campaign_id, subscription)
+        return jsonify({"success": False, "message": "Campaign not found"}), 404
+    
+    def stream():
+        try:
+            yield campaign_events.format_sse(dict(status, type="progress"))
+            if status["status"] in ("COMPLETED", "FAILED"):
+                yield campaign_events.format_sse(dict(status, type="done"))
+                return
+            
+            while True:
+                try:
+                    event = subscription.get(timeout=15)
+                except queue.Empty:
+                    # Keep proxies from closing an idle stream, and stop if the run ended unseen
+                    latest = outreach_agent.get_campaign_status(campaign_id)
+                    if latest and latest["status"] in ("COMPLETED", "FAILED"):
+                        yield campaign_events.format_sse(dict(latest, type="done"))
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                yield campaign_events.format_sse(event)
+                if event["type"] == "done":
+                    return
+        finally:
+            campaign_events.unsubscribe(campaign_id, subscription)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/users/add', methods=['POST'])
 def add_user():
     """Add new user"""
@@ -318,10 +964,12 @@ def add_user():
             "email": data["email"],
             "job_title": data["job_title"],
             "keywords": data["keywords"],
+            **skill_fields(data["keywords"]),  # Canonical names and ids, precomputed for matchmaking
             "status": "PENDING",
             "created_at": datetime.utcnow()
         }
         result = users_collection.insert_one(user)
+        invalidate_user_status_counts()
         return jsonify({"success": True, "user_id": str(result.inserted_id)})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
@@ -334,21 +982,32 @@ def reset_users():
             {},
             {"$set": {"status": "PENDING"}, "$unset": {"error_message": "", "sent_at": ""}}
         )
+        invalidate_user_status_counts()
         return jsonify({"success": True, "modified": result.modified_count})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)}), 500
 
+@app.route('/api/gemini/health')
+def gemini_health():
+    """Per-key Gemini API health, rate-limit headroom and cache counters"""
+    return jsonify({"success": True, "keys": api_manager.key_health(), "cache": api_manager.cache_stats()})
+
 @app.route('/users')
 def users_page():
     """Users management page"""
-    users = list(users_collection.find().sort("created_at", -1))
-    return render_template('users.html', users=users)
+    after, page_size = page_request_args()
+    users, next_cursor = paginate(users_collection, USERS_PAGE_FIELDS, after, page_size)
+    return render_template('users.html', users=users, total_users=get_user_status_counts()["total_users"],
+                           next_cursor=next_cursor, page_size=page_size)
 
 @app.route('/campaigns')
 def campaigns_page():
     """Campaign history page"""
-    campaigns = list(campaigns_collection.find().sort("created_at", -1))
-    return render_template('campaigns.html', campaigns=campaigns)
+    after, page_size = page_request_args()
+    campaigns, next_cursor = paginate(campaigns_collection, CAMPAIGNS_PAGE_FIELDS, after, page_size)
+    return render_template('campaigns.html', campaigns=campaigns,
+                           total_campaigns=campaigns_collection.estimated_document_count(),
+                           next_cursor=next_cursor, page_size=page_size)
 
 if __name__ == '__main__':
     print("🚀 Starting HackTwin Web Application")
@@ -0,0 +1,120 @@
+"""
+Bulk Write Buffer
+Collects per-item Mongo updates and flushes them in batches instead of one round-trip each
+"""
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+MONGO_BULK_BATCH_SIZE = int(os.getenv("MONGO_BULK_BATCH_SIZE", "500"))
+MONGO_BULK_FLUSH_MS = int(os.getenv("MONGO_BULK_FLUSH_MS", "250"))
+MONGO_BULK_RETRIES = int(os.getenv("MONGO_BULK_RETRIES", "3"))
+
+class BulkWriteBuffer:
+    """Thread-safe buffer flushed every `max_items` items or `max_delay_ms` milliseconds
+
+    `write` receives the buffered items as a list and is expected to turn them
+    into unordered `bulk_write` calls. Flushes run one at a time, in the order
+    the items were added. Use as a context manager (or call `close`) to
+    guarantee the final partial batch is written.
+
+    `write` must be safe to repeat (e.g. `$set` updates): a failed batch is
+    retried with backoff, and a batch that still fails is kept in
+    `failed_items` and makes `close` raise.
+    """
+
+    def __init__(self, write, max_items=MONGO_BULK_BATCH_SIZE, max_delay_ms=MONGO_BULK_FLUSH_MS,
+                 retries=MONGO_BULK_RETRIES):
+        self.write = write
+        self.max_items = max(1, max_items)
+        self.max_delay = max(1, max_delay_ms) / 1000
+        self.retries = max(0, retries)
+
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()  # Serializes writes so batches land in order
+        self.batch_started = threading.Condition(self.lock)
+        self.items = []
+        self.oldest_at = None
+        self.closed = False
+        self.flushes = 0
+        self.flushed_items = 0
+        self.failed_items = []
+        self.last_error = None
+
+        self.timer = threading.Thread(target=self._flush_on_interval, daemon=True)
+        self.timer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, item):
+        """Buffer one item, flushing right away once the batch is full"""
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("BulkWriteBuffer is closed")
+            if not self.items:
+                self.oldest_at = time.monotonic()
+                self.batch_started.notify()  # Start the delay clock for this batch
+            self.items.append(item)
+            full = len(self.items) >= self.max_items
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered so far"""
+        with self.flush_lock:
+            with self.lock:
+                items, self.items = self.items, []
+                self.oldest_at = None
+            if not items:
+                return
+            for attempt in range(self.retries + 1):
+                try:
+                    self.write(items)
+                    break
+                except Exception as e:
+                    self.last_error = e
+                    if attempt < self.retries:
+                        print(f"⚠️  Bulk write of {len(items)} items failed, retrying: {e}")
+                        time.sleep(0.5 * 2 ** attempt)
+                    else:
+                        print(f"❌ Bulk write of {len(items)} items failed after {attempt + 1} attempts: {e}")
+                        self.failed_items.extend(items)
+                        return
+            self.flushes += 1
+            self.flushed_items += len(items)
+
+    def close(self):
+        """Stop the interval flusher and write the final partial batch
+
+        Raises RuntimeError if any batch could not be written.
+        """
+        with self.lock:
+            self.closed = True
+            self.batch_started.notify()
+        self.timer.join()
+        self.flush()
+        if self.failed_items:
+            raise RuntimeError(f"{len(self.failed_items)} buffered writes failed: {self.last_error}")
+
+    def _flush_on_interval(self):
+        while True:
+            with self.lock:
+                while not self.closed:
+                    if self.oldest_at is None:
+                        self.batch_started.wait()
+                        continue
+                    remaining = self.oldest_at + self.max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.batch_started.wait(remaining)
+                if self.closed:
+                    return
+            self.flush()
@@ -0,0 +1,50 @@
+"""
+Campaign Event Broker
+Fans out live per-recipient campaign progress to Server-Sent Events subscribers
+"""
+import json
+import queue
+import threading
+
+class CampaignEventBroker:
+    """In-process publish/subscribe channel keyed by campaign id
+
+    Events are only delivered to subscribers connected at publish time; nothing
+    is retained, so a large campaign never accumulates results in memory.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}  # campaign_id -> set of queues
+
+    def subscribe(self, campaign_id):
+        """Register a listener and return the queue its events arrive on"""
+        subscription = queue.Queue()
+        with self.lock:
+            self.subscribers.setdefault(str(campaign_id), set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, campaign_id, subscription):
+        """Remove a listener (e.g. when the browser disconnects)"""
+        with self.lock:
+            listeners = self.subscribers.get(str(campaign_id))
+            if listeners is not None:
+                listeners.discard(subscription)
+                if not listeners:
+                    del self.subscribers[str(campaign_id)]
+
+    def publish(self, campaign_id, event_type, /, **data):
+        """Send an event to everyone watching a campaign"""
+        event = dict(data, type=event_type)
+        with self.lock:
+            listeners = list(self.subscribers.get(str(campaign_id), ()))
+        for subscription in listeners:
+            subscription.put(event)
+
+    @staticmethod
+    def format_sse(event):
+        """Encode an event dict as a Server-Sent Events message"""
+        return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+# Global instance
+campaign_events = CampaignEventBroker()
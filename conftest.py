@@ -0,0 +1,7 @@
+"""
+Shared pytest setup: importing the matchmaker builds the Gemini key pool, which refuses to start without a key
+"""
+import os
+
+os.environ.setdefault("GEMINI_API_KEYS", "test-key")
+os.environ.setdefault("GEMINI_CACHE_PATH", "")
@@ -1,60 +1,492 @@
 """
 Gemini API Key Manager
-Handles round-robin distribution of API keys to avoid rate limits
+Routes requests across a pool of API keys using per-key rate limits and health
 """
 import os
+import re
+import time
+import asyncio
+import hashlib
+import sqlite3
+import functools
 import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 import google.generativeai as genai
+from google.ai import generativelanguage as glm
 from dotenv import load_dotenv
 
+try:
+    from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+    RATE_LIMIT_ERRORS = (ResourceExhausted, TooManyRequests)
+except ImportError:
+    RATE_LIMIT_ERRORS = ()
+
 # Load environment variables
 load_dotenv()
 
+# Free-tier defaults for gemini-2.0-flash (override via .env)
+DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "10"))
+DEFAULT_TOKENS_PER_MINUTE = int(os.getenv("GEMINI_TOKENS_PER_MINUTE", "1000000"))
+
+# Cooldown applied to a throttled key, doubled on every consecutive 429
+BASE_COOLDOWN_SECONDS = float(os.getenv("GEMINI_BASE_COOLDOWN", "5"))
+MAX_COOLDOWN_SECONDS = float(os.getenv("GEMINI_MAX_COOLDOWN", "300"))
+
+# Worker threads shared by all async callers (e.g. the Discord bot)
+ASYNC_WORKERS = int(os.getenv("GEMINI_ASYNC_WORKERS", "16"))
+
+# Response cache: in-memory LRU in front of a local SQLite file (set GEMINI_CACHE_PATH= to disable disk)
+CACHE_MAX_ENTRIES = int(os.getenv("GEMINI_CACHE_SIZE", "1000"))
+CACHE_TTL_SECONDS = float(os.getenv("GEMINI_CACHE_TTL", str(24 * 3600)))
+CACHE_PATH = os.getenv("GEMINI_CACHE_PATH",
+                       os.path.join(os.path.dirname(os.path.abspath(__file__)), ".gemini_cache.sqlite3"))
+CACHE_MAX_DISK_ENTRIES = int(os.getenv("GEMINI_CACHE_DISK_SIZE", "50000"))
+CACHE_PRUNE_EVERY = 100  # Disk writes between expiry/size sweeps
+
+class TokenBucket:
+    """Continuously refilling token bucket sized for a per-minute limit"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.refill_per_second = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+            self.updated_at = now
+
+    def wait_time(self, amount, now=None):
+        """Seconds until `amount` tokens are available (0 if available now)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        # A single request larger than the bucket can never fit - cap it
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def consume(self, amount, now=None):
+        """Take tokens from the bucket (may go negative to record overuse)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        self.tokens -= amount
+
+def load_api_keys():
+    """Collect Gemini API keys from the environment and an optional key file"""
+    keys = []
+
+    # Comma/whitespace separated list: GEMINI_API_KEYS=key_a,key_b,...
+    keys.extend(re.split(r"[,\s]+", os.getenv("GEMINI_API_KEYS", "")))
+
+    # One key per line, '#' starts a comment: GEMINI_API_KEYS_FILE=keys.txt
+    keys_file = os.getenv("GEMINI_API_KEYS_FILE")
+    if keys_file:
+        try:
+            with open(keys_file, 'r', encoding='utf-8') as f:
+                keys.extend(line.split('#', 1)[0].strip() for line in f)
+        except OSError as e:
+            print(f"⚠️  Could not read GEMINI_API_KEYS_FILE ({keys_file}): {e}")
+
+    # Numbered keys in numeric order: GEMINI_API_KEY1, GEMINI_API_KEY2, ...
+    numbered = [(int(match.group(1)), value) for name, value in os.environ.items()
+                if (match := re.fullmatch(r"GEMINI_API_KEY(\d+)", name))]
+    keys.extend(value for _, value in sorted(numbered))
+
+    # Fallback to original key
+    keys.append(os.getenv("GEMINI_API_KEY", ""))
+
+    # Drop blanks and duplicates, keeping the first occurrence
+    return list(dict.fromkeys(key.strip() for key in keys if key and key.strip()))
+
+def is_rate_limit_error(error):
+    """True if an exception from the Gemini client means the key was throttled"""
+    if RATE_LIMIT_ERRORS and isinstance(error, RATE_LIMIT_ERRORS):
+        return True
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+class KeyState:
+    """Rate limits and health statistics for a single API key"""
+
+    def __init__(self, api_key, number, requests_per_minute, tokens_per_minute):
+        self.api_key = api_key
+        self.number = number
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+
+        self.total_requests = 0
+        self.throttle_count = 0  # Total 429s seen on this key
+        self.consecutive_throttles = 0
+        self.error_count = 0
+        self.last_error_at = None
+        self.cooldown_until = 0.0
+        self.avg_latency = None  # Exponentially weighted moving average (seconds)
+
+    def wait_time(self, estimated_tokens, now):
+        """Seconds until this key can take a request of the given size"""
+        return max(
+            self.cooldown_until - now,
+            self.request_bucket.wait_time(1, now),
+            self.token_bucket.wait_time(estimated_tokens, now),
+            0.0
+        )
+
+    def headroom(self):
+        """Fraction of the tighter of the two buckets still available"""
+        return min(self.request_bucket.tokens / self.request_bucket.capacity,
+                   self.token_bucket.tokens / self.token_bucket.capacity)
+
+    def health(self):
+        """Summary of this key's state for monitoring (never exposes the key)"""
+        now = time.monotonic()
+        return {
+            "key": f"#{self.number} (...{self.api_key[-4:]})",
+            "total_requests": self.total_requests,
+            "throttle_count": self.throttle_count,
+            "error_count": self.error_count,
+            "avg_latency": round(self.avg_latency, 3) if self.avg_latency is not None else None,
+            "last_error_at": self.last_error_at,
+            "cooldown_remaining": round(max(0.0, self.cooldown_until - now), 1),
+            "headroom": round(max(0.0, self.headroom()), 3)
+        }
+
+class ResponseCache:
+    """Content-addressed cache of generated text: memory LRU with TTL plus a SQLite tier"""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS, db_path=CACHE_PATH,
+                 max_disk_entries=CACHE_MAX_DISK_ENTRIES):
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.disk_writes = 0
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires_at, text), most recently used last
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db = None
+        if db_path:
+            try:
+                self.db = sqlite3.connect(db_path, check_same_thread=False)
+                self.db.execute("CREATE TABLE IF NOT EXISTS responses "
+                                "(key TEXT PRIMARY KEY, text TEXT NOT NULL, expires_at REAL NOT NULL)")
+                self.db.execute("CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)")
+                self._prune()
+            except sqlite3.Error as e:
+                print(f"⚠️  Response cache disk tier disabled ({db_path}): {e}")
+                self.db = None
+
+    @staticmethod
+    def make_key(model_name, prompt):
+        """Hash of the model name and whitespace-normalized prompt"""
+        normalized = " ".join(prompt.split())
+        return hashlib.sha256(f"{model_name}\n{normalized}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key, text, expires_at):
+        self.entries[key] = (expires_at, text)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _prune(self):
+        """Delete expired rows and the soonest-to-expire rows beyond max_disk_entries (caller holds the lock)"""
+        self.db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+        excess = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - self.max_disk_entries
+        if excess > 0:
+            self.db.execute("DELETE FROM responses WHERE key IN "
+                            "(SELECT key FROM responses ORDER BY expires_at LIMIT ?)", (excess,))
+        self.db.commit()
+
+    def get(self, key):
+        """Return the cached text for a key, or None on a miss"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self.entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return entry[1]
+                del self.entries[key]
+
+            if self.db is not None:
+                try:
+                    row = self.db.execute("SELECT text, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+                except sqlite3.Error as e:
+                    print(f"⚠️  Response cache disk lookup failed, treating as a miss: {e}")
+                    row = None
+                if row and row[1] > now:
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, key, text):
+        """Store generated text in both tiers"""
+        expires_at = time.time() + self.ttl_seconds
+        with self.lock:
+            self._remember(key, text, expires_at)
+            if self.db is not None:
+                try:
+                    self.db.execute("INSERT OR REPLACE INTO responses (key, text, expires_at) VALUES (?, ?, ?)",
+                                    (key, text, expires_at))
+                    self.db.commit()
+                    self.disk_writes += 1
+                    if self.disk_writes % CACHE_PRUNE_EVERY == 0:
+                        self._prune()
+                except sqlite3.Error as e:
+                    print(f"⚠️  Could not persist cached response: {e}")
+
+    def clear(self):
+        """Drop every cached response from both tiers"""
+        with self.lock:
+            self.entries.clear()
+            if self.db is not None:
+                try:
+                    self.db.execute("DELETE FROM responses")
+                    self.db.commit()
+                except sqlite3.Error as e:
+                    print(f"⚠️  Could not clear the response cache disk tier: {e}")
+
+    def stats(self):
+        """Hit/miss counters for monitoring"""
+        with self.lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self.entries)
+            }
+
 class GeminiAPIManager:
-    """Manages multiple Gemini API keys with round-robin distribution"""
-    
-    def __init__(self):
-        self.api_keys = []
-        self.current_key_index = 0
-        self.lock = threading.Lock()  # Thread-safe key rotation
-        
-        # Load all available API keys
-        key1 = os.getenv("GEMINI_API_KEY1")
-        key2 = os.getenv("GEMINI_API_KEY2") 
-        
-        if key1:
-            self.api_keys.append(key1)
-        if key2:
-            self.api_keys.append(key2)
-            
-        # Fallback to original key if new ones aren't available
-        original_key = os.getenv("GEMINI_API_KEY")
-        if original_key and original_key not in self.api_keys:
-            self.api_keys.append(original_key)
-            
+    """Manages a pool of Gemini API keys, routing each call to the healthiest key"""
+
+    def __init__(self, api_keys=None, requests_per_minute=None, tokens_per_minute=None):
+        self.lock = threading.Lock()  # Thread-safe key selection
+        self.requests_per_minute = requests_per_minute or DEFAULT_REQUESTS_PER_MINUTE
+        self.tokens_per_minute = tokens_per_minute or DEFAULT_TOKENS_PER_MINUTE
+
+        # Load all available API keys (explicit list wins over the environment)
+        self.api_keys = list(dict.fromkeys(api_keys)) if api_keys else load_api_keys()
+
         if not self.api_keys:
-            raise ValueError("No Gemini API keys found! Please set GEMINI_API_KEY1 and GEMINI_API_KEY2 in .env")
-            
-        print(f"🔑 Initialized Gemini API Manager with {len(self.api_keys)} API keys")
-    
+            raise ValueError("No Gemini API keys found! Please set GEMINI_API_KEYS, GEMINI_API_KEYS_FILE "
+                             "or GEMINI_API_KEY1, GEMINI_API_KEY2, ... in .env")
+
+        self.key_states = [
+            KeyState(key, number, self.requests_per_minute, self.tokens_per_minute)
+            for number, key in enumerate(self.api_keys, 1)
+        ]
+        self.states_by_key = {state.api_key: state for state in self.key_states}
+
+        # One client per key and one model handle per (key, model_name), reused across calls
+        self.model_lock = threading.Lock()
+        self.clients = {}
+        self.models = {}
+
+        self.cache = ResponseCache()
+
+        # Futures for requests currently being generated, keyed like the cache
+        self.in_flight_lock = threading.Lock()
+        self.in_flight = {}
+        self.coalesced_requests = 0
+
+        # Bounded pool that runs blocking calls for generate_async()
+        self.executor = ThreadPoolExecutor(max_workers=ASYNC_WORKERS, thread_name_prefix="gemini")
+
+        # Enough attempts to try every key at least twice before giving up
+        self.max_attempts = int(os.getenv("GEMINI_MAX_ATTEMPTS", str(max(3, 2 * len(self.api_keys)))))
+
+        print(f"🔑 Initialized Gemini API Manager with {len(self.api_keys)} API keys "
+              f"({self.requests_per_minute} RPM / {self.tokens_per_minute} TPM per key)")
+
+    @staticmethod
+    def estimate_tokens(prompt):
+        """Rough token estimate (~4 characters per token)"""
+        return max(1, len(prompt) // 4)
+
+    def acquire_api_key(self, estimated_tokens=0):
+        """Block until some key has capacity, then reserve the one with most headroom"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                best = None
+                shortest_wait = None
+
+                for state in self.key_states:
+                    wait = state.wait_time(estimated_tokens, now)
+                    if wait == 0:
+                        # Most headroom first, lower latency breaks ties
+                        rank = (state.headroom(), -(state.avg_latency or 0.0))
+                        if best is None or rank > best[0]:
+                            best = (rank, state)
+                    elif shortest_wait is None or wait < shortest_wait:
+                        shortest_wait = wait
+
+                if best is not None:
+                    state = best[1]
+                    state.request_bucket.consume(1, now)
+                    state.token_bucket.consume(estimated_tokens, now)
+                    state.total_requests += 1
+                    print(f"🔄 Using API key #{state.number} (of {len(self.key_states)})")
+                    return state.api_key
+
+            # Every key is saturated or cooling down - sleep until the first one frees up
+            print(f"⏳ All API keys at capacity, waiting {shortest_wait:.1f}s...")
+            time.sleep(shortest_wait)
+
+    def record_success(self, api_key, latency, estimated_tokens=0, actual_tokens=None):
+        """Update a key's latency and token usage after a successful call"""
+        with self.lock:
+            state = self.states_by_key[api_key]
+            state.consecutive_throttles = 0
+            state.avg_latency = latency if state.avg_latency is None else 0.8 * state.avg_latency + 0.2 * latency
+            if actual_tokens is not None:
+                # Correct the reservation once the real token count is known
+                state.token_bucket.consume(actual_tokens - estimated_tokens)
+
+    def record_throttle(self, api_key):
+        """Put a throttled key into cooldown with exponential backoff"""
+        with self.lock:
+            state = self.states_by_key[api_key]
+            state.throttle_count += 1
+            state.consecutive_throttles += 1
+            state.last_error_at = time.time()
+            cooldown = min(MAX_COOLDOWN_SECONDS, BASE_COOLDOWN_SECONDS * 2 ** (state.consecutive_throttles - 1))
+            state.cooldown_until = time.monotonic() + cooldown
+            print(f"🧊 API key #{state.number} throttled, cooling down for {cooldown:.0f}s")
+
+    def record_error(self, api_key):
+        """Record a non-throttling failure on a key"""
+        with self.lock:
+            state = self.states_by_key[api_key]
+            state.error_count += 1
+            state.last_error_at = time.time()
+
+    def key_health(self):
+        """Per-key health statistics for monitoring"""
+        with self.lock:
+            return [state.health() for state in self.key_states]
+
     def get_next_api_key(self):
-        """Get the next API key in round-robin fashion"""
-        with self.lock:
-            key = self.api_keys[self.current_key_index]
-            self.current_key_index = (self.current_key_index + 1) % len(self.api_keys)
-            print(f"🔄 Using API key #{self.current_key_index} (of {len(self.api_keys)})")
-            return key
-    
-    def configure_genai(self):
-        """Configure genai with the next available API key"""
-        api_key = self.get_next_api_key()
-        genai.configure(api_key=api_key)
-        return api_key
-    
+        """Get the API key with the most rate-limit headroom"""
+        return self.acquire_api_key()
+
+    def get_model(self, api_key, model_name="gemini-2.0-flash-exp"):
+        """Get the cached model handle for a key, building it on first use"""
+        cache_key = (api_key, model_name)
+        with self.model_lock:
+            model = self.models.get(cache_key)
+            if model is None:
+                client = self.clients.get(api_key)
+                if client is None:
+                    client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+                    self.clients[api_key] = client
+                model = genai.GenerativeModel(model_name)
+                # Bind the key's own client so calls never rely on genai.configure() global state.
+                # _client is private to google-generativeai; requirements.txt pins the version this was checked against.
+                if not hasattr(model, "_client"):
+                    raise RuntimeError("Installed google-generativeai has no GenerativeModel._client; "
+                                       "install the version pinned in requirements.txt")
+                model._client = client
+                self.models[cache_key] = model
+            return model
+
     def get_configured_model(self, model_name="gemini-2.0-flash-exp"):
-        """Get a configured Gemini model with rotated API key"""
-        self.configure_genai()
-        return genai.GenerativeModel(model_name)
+        """Get a Gemini model bound to a rate-limited API key"""
+        return self.get_model(self.get_next_api_key(), model_name)
+
+    def cache_stats(self):
+        """Response cache hit/miss counters plus coalesced in-flight requests"""
+        stats = self.cache.stats()
+        stats["coalesced"] = self.coalesced_requests
+        return stats
+
+    def generate(self, prompt, model_name="gemini-2.0-flash-exp", use_cache=True):
+        """Generate text for a prompt, failing over to other keys when one is throttled
+
+        Identical (model, prompt) pairs are served from the response cache, and
+        callers that arrive while the same request is already running wait for
+        its result instead of spending quota. With use_cache=False the call is
+        fully independent: no cache read or write and no coalescing.
+        """
+        if not use_cache:
+            return self._generate_uncached(prompt, model_name)
+
+        cache_key = ResponseCache.make_key(model_name, prompt)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            print("⚡ Served Gemini response from cache")
+            return cached
+
+        with self.in_flight_lock:
+            future = self.in_flight.get(cache_key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self.in_flight[cache_key] = future
+            else:
+                self.coalesced_requests += 1
+
+        if not is_leader:
+            print("🔗 Joined identical in-flight Gemini request")
+            return future.result()
+
+        try:
+            text = self._generate_uncached(prompt, model_name)
+            self.cache.set(cache_key, text)
+            future.set_result(text)
+            return text
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.in_flight_lock:
+                del self.in_flight[cache_key]
+
+    def _generate_uncached(self, prompt, model_name):
+        """Call Gemini with key selection, usage accounting and 429 failover"""
+        estimated_tokens = self.estimate_tokens(prompt)
+        last_error = None
+
+        for attempt in range(self.max_attempts):
+            api_key = self.acquire_api_key(estimated_tokens)
+            started = time.monotonic()
+            try:
+                response = self.get_model(api_key, model_name).generate_content(prompt)
+            except Exception as e:
+                last_error = e
+                if is_rate_limit_error(e):
+                    # Another key (or this one after its cooldown) takes the retry
+                    self.record_throttle(api_key)
+                    continue
+                self.record_error(api_key)
+                raise
+
+            usage = getattr(response, "usage_metadata", None)
+            self.record_success(api_key, time.monotonic() - started, estimated_tokens,
+                                getattr(usage, "total_token_count", None))
+            return response.text
+
+        raise last_error
+
+    async def generate_async(self, prompt, model_name="gemini-2.0-flash-exp", use_cache=True):
+        """Awaitable generate() that never blocks the event loop
+
+        Runs on a bounded worker pool so asyncio callers share the same key pool,
+        rate limiter and failover logic as synchronous callers.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(self.generate, prompt, model_name, use_cache))
 
 # Global instance
 api_manager = GeminiAPIManager()
@@ -6,18 +6,28 @@ Advanced user matching based on skills extracted from resumes
 import os
 import re
 import time
+import threading
 import PyPDF2
 import docx
 import google.generativeai as genai
-from pymongo import MongoClient
-from bson import ObjectId
+from pymongo import MongoClient, UpdateOne
+from bson import Binary, ObjectId
 import numpy as np
+from scipy import sparse
 from datetime import datetime
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
 
+# Semantic matching is optional - it needs sentence-transformers (and torch)
+try:
+    from sentence_transformers import SentenceTransformer
+    SEMANTIC_AVAILABLE = True
+except ImportError:
+    SentenceTransformer = None
+    SEMANTIC_AVAILABLE = False
+
 # Load environment variables
 load_dotenv()
 
@@ -26,6 +36,38 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from gemini_api_manager import api_manager
+from smtp_pool import smtp_pool
+from skills import has_current_skill_fields, normalize_skills, skill_fields, skill_registry, user_skill_set
+
+# Full rebuild interval for the in-memory skill index (picks up writes made outside this process)
+SKILL_INDEX_REFRESH_SECONDS = int(os.getenv("SKILL_INDEX_REFRESH_SECONDS", "300"))
+
+# Rows of the user x user overlap matrix materialized at once during bulk matching
+BULK_MATCH_BLOCK_SIZE = int(os.getenv("BULK_MATCH_BLOCK_SIZE", "1024"))
+
+# Stored per-user match lists: top MATCH_LIST_SIZE users at or above MATCH_THRESHOLD similarity
+MATCH_LIST_SIZE = int(os.getenv("MATCH_LIST_SIZE", "10"))
+MATCH_THRESHOLD = float(os.getenv("MATCH_THRESHOLD", "0.1"))
+
+MATCHING_MODE = os.getenv("MATCHING_MODE", "exact").lower()
+
+# MATCHING_MODE=approximate finds candidates through MinHash LSH instead of full skill posting lists.
+# More bands (or fewer rows per band) raise recall at the cost of larger candidate sets.
+APPROXIMATE_MATCHING = MATCHING_MODE == "approximate"
+LSH_BANDS = int(os.getenv("LSH_BANDS", "64"))
+LSH_ROWS = int(os.getenv("LSH_ROWS", "3"))
+MERSENNE_PRIME = (1 << 31) - 1
+
+# MATCHING_MODE=semantic ranks users by embedding similarity of their skill profiles, blended
+# with SEMANTIC_OVERLAP_WEIGHT x the skill overlap score (0 = embeddings only)
+SEMANTIC_MATCHING = MATCHING_MODE == "semantic"
+SKILL_EMBEDDING_MODEL = os.getenv("SKILL_EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+SEMANTIC_OVERLAP_WEIGHT = float(os.getenv("SEMANTIC_OVERLAP_WEIGHT", "0.3"))
+# Minimum blended score in semantic mode. Embedding cosines live on a different scale from
+# skill overlap: bge-small puts even unrelated "Skills: ..." profiles around 0.5-0.65, so the
+# overlap-mode threshold (0.1) would admit everyone. Re-tune when changing the model.
+SEMANTIC_THRESHOLD = float(os.getenv("SEMANTIC_THRESHOLD", "0.6"))
+SEMANTIC_CANDIDATES_PER_MATCH = 5  # Nearest neighbours rescored per requested match
 
 class SkillExtractor:
     """Extract skills from resume documents using Gemini AI"""
@@ -95,13 +137,9 @@ class SkillExtractor:
         
         try:
             print(f"🤖 Extracting skills with AI (with distributed keys)...")
-            print("⏳ Applying rate limiting with key rotation (7 seconds)...")
-            time.sleep(7)  # Reduced delay since we have multiple keys
             
-            # Use the API manager to get a configured model with rotated key
-            model = api_manager.get_configured_model("gemini-2.0-flash-exp")
-            response = model.generate_content(prompt)
-            skills_text = response.text.strip()
+            # The API manager blocks only until a key has rate-limit capacity
+            skills_text = api_manager.generate(prompt, "gemini-2.0-flash-exp").strip()
             
             # Clean and parse skills
             skills = [skill.strip() for skill in skills_text.split(',')]
@@ -132,11 +170,424 @@ class SkillExtractor:
         
         return list(skills)
 
+class MinHashLSH:
+    """MinHash signatures of skill-id sets, bucketed into LSH bands
+    
+    Two users land in a common bucket with probability 1 - (1 - J^rows)^bands,
+    where J is the Jaccard similarity of their skill sets, so a lookup returns
+    high-overlap users without visiting everyone who shares a common skill.
+    
+    Users loaded by `build` live in one sorted array of bucket keys searched
+    with searchsorted; users updated afterwards go to a small dict overlay and
+    their stale array entries are masked until the next build.
+    """
+    
+    def __init__(self, bands=LSH_BANDS, rows=LSH_ROWS, seed=1):
+        self.bands = bands
+        self.rows = rows
+        rng = np.random.default_rng(seed)  # Fixed seed keeps signatures comparable across rebuilds
+        self.a = rng.integers(1, MERSENNE_PRIME, bands * rows, dtype=np.int64)
+        self.b = rng.integers(0, MERSENNE_PRIME, bands * rows, dtype=np.int64)
+        self.row_mix = rng.integers(1, MERSENNE_PRIME, rows, dtype=np.int64) | 1
+        self.band_salt = rng.integers(0, np.iinfo(np.int64).max, bands, dtype=np.int64)
+        
+        self.built_ids = []  # position -> user id for users loaded by build()
+        self.built_positions = {}  # user id -> position
+        self.sorted_keys = np.empty(0, dtype=np.int64)
+        self.sorted_positions = np.empty(0, dtype=np.int64)
+        self.superseded = set()  # built users updated or removed since
+        
+        self.user_keys = {}  # user id -> bucket keys, for users updated after build()
+        self.buckets = {}  # bucket key -> set of user ids, for users updated after build()
+    
+    def _hashes(self, ids):
+        return (self.a[:, None] * ids[None, :] + self.b[:, None]) % MERSENNE_PRIME
+    
+    def _bucket_keys(self, signatures):
+        """One integer key per (user, band); int64 overflow just wraps, which is fine for a hash"""
+        banded = signatures.reshape(len(signatures), self.bands, self.rows)
+        return (banded * self.row_mix).sum(axis=2) ^ self.band_salt
+    
+    def _keys_for(self, skills):
+        signature = self._hashes(np.fromiter(skills, dtype=np.int64)).min(axis=1)
+        return self._bucket_keys(signature[None, :])[0]
+    
+    def build(self, user_skills, chunk_size=4096):
+        """Sign and bucket every user at once (hashes reduced per user with reduceat)"""
+        items = [(user_id, skills) for user_id, skills in user_skills.items() if skills]
+        key_chunks = []
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            lengths = np.fromiter((len(skills) for _, skills in chunk), dtype=np.int64, count=len(chunk))
+            ids = np.fromiter((skill for _, skills in chunk for skill in skills), dtype=np.int64,
+                              count=int(lengths.sum()))
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            signatures = np.minimum.reduceat(self._hashes(ids), offsets, axis=1).T
+            key_chunks.append(self._bucket_keys(signatures))
+        
+        keys = np.concatenate(key_chunks).ravel() if key_chunks else np.empty(0, dtype=np.int64)
+        positions = np.repeat(np.arange(len(items), dtype=np.int64), self.bands)
+        order = np.argsort(keys, kind="stable")
+        
+        self.built_ids = [user_id for user_id, _ in items]
+        self.built_positions = {user_id: position for position, user_id in enumerate(self.built_ids)}
+        self.sorted_keys = keys[order]
+        self.sorted_positions = positions[order]
+        self.superseded = set()
+        self.user_keys = {}
+        self.buckets = {}
+    
+    def update(self, user_id, skills):
+        """Replace a user's signature (an empty skill set removes them)"""
+        if user_id in self.built_positions:
+            self.superseded.add(user_id)
+        for key in self.user_keys.pop(user_id, ()):
+            holders = self.buckets.get(key)
+            if holders is not None:
+                holders.discard(user_id)
+                if not holders:
+                    del self.buckets[key]
+        if skills:
+            keys = self._keys_for(skills).tolist()
+            self.user_keys[user_id] = keys
+            for key in keys:
+                self.buckets.setdefault(key, set()).add(user_id)
+    
+    def query(self, skills):
+        """Users sharing at least one band with this skill set"""
+        if not skills:
+            return set()
+        keys = self._keys_for(skills)
+        
+        starts = np.searchsorted(self.sorted_keys, keys, side="left")
+        ends = np.searchsorted(self.sorted_keys, keys, side="right")
+        hits = [self.sorted_positions[start:end] for start, end in zip(starts, ends) if end > start]
+        found = set()
+        if hits:
+            found = {self.built_ids[position] for position in np.unique(np.concatenate(hits)).tolist()}
+            found -= self.superseded
+        
+        for key in keys.tolist():
+            found.update(self.buckets.get(key, ()))
+        return found
+
+class PeriodicIndex:
+    """Base for in-memory indexes rebuilt from Mongo every `refresh_seconds`
+    
+    Only one thread rebuilds at a time; the others keep serving the current
+    index (or wait, if there is none yet). Updates made while a rebuild is
+    loading are recorded and replayed onto the new index when it is swapped in.
+    """
+    
+    def __init__(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self.lock = threading.Lock()  # Guards the index itself
+        self.rebuild_lock = threading.Lock()  # Held for the whole of a rebuild
+        self.pending_updates = None  # user id -> latest update, while a rebuild runs
+        self.built_at = None
+    
+    def _stale(self):
+        return self.built_at is None or time.monotonic() - self.built_at > self.refresh_seconds
+    
+    def _ensure_fresh(self):
+        if not self._stale():
+            return
+        if self.built_at is None:
+            with self.rebuild_lock:  # Nothing to serve yet - wait for the first build
+                if self._stale():
+                    self._rebuild()
+        elif self.rebuild_lock.acquire(blocking=False):
+            try:
+                if self._stale():
+                    self._rebuild()
+            finally:
+                self.rebuild_lock.release()
+    
+    def rebuild(self):
+        """Reload the whole index from Mongo"""
+        with self.rebuild_lock:
+            self._rebuild()
+    
+    def _rebuild(self):
+        with self.lock:
+            self.pending_updates = {}
+        try:
+            self.load()
+        finally:
+            with self.lock:
+                self.pending_updates = None
+    
+    def _record_update(self, user_id, update):
+        """Remember an update for replay if a rebuild is running (caller holds self.lock)"""
+        if self.pending_updates is not None:
+            self.pending_updates[user_id] = update
+    
+    def _replay_updates(self):
+        """Apply updates made during the rebuild to the freshly loaded index (caller holds self.lock)"""
+        for user_id, update in self.pending_updates.items():
+            self._apply(user_id, update)
+
+class SkillIndex(PeriodicIndex):
+    """In-memory inverted index: skill id -> ids of users who have it"""
+    
+    def __init__(self, db_collection, refresh_seconds=SKILL_INDEX_REFRESH_SECONDS, approximate=APPROXIMATE_MATCHING):
+        super().__init__(refresh_seconds)
+        self.users_collection = db_collection
+        self.approximate = approximate
+        self.lsh = MinHashLSH() if approximate else None
+        self.postings = {}  # skill id -> set of user ids
+        self.user_skills = {}  # user id -> frozenset of skill ids
+    
+    def load(self):
+        """Load every user's skill ids from Mongo, backfilling documents that predate them or the alias table"""
+        postings = {}
+        user_skills = {}
+        backfill = []
+        for user in self.users_collection.find({"keywords": {"$exists": True, "$ne": []}},
+                                               {"keywords": 1, "skill_ids": 1, "skill_version": 1}):
+            if not has_current_skill_fields(user):
+                backfill.append(UpdateOne({"_id": user["_id"]}, {"$set": skill_fields(user["keywords"])}))
+            skills = frozenset(user_skill_set(user))
+            user_skills[user["_id"]] = skills
+            for skill in skills:
+                postings.setdefault(skill, set()).add(user["_id"])
+        
+        if backfill:
+            self.users_collection.bulk_write(backfill, ordered=False)
+            print(f"🧹 Stored canonical skill ids on {len(backfill)} older user documents")
+        
+        lsh = None
+        if self.approximate:
+            lsh = MinHashLSH(self.lsh.bands, self.lsh.rows)
+            lsh.build(user_skills)
+        
+        with self.lock:
+            self.postings = postings
+            self.user_skills = user_skills
+            if lsh is not None:
+                self.lsh = lsh
+            self._replay_updates()
+            self.built_at = time.monotonic()
+        print(f"🗂️  Built skill index: {len(user_skills)} users, {len(postings)} distinct skills")
+    
+    def update_user(self, user_id, skills):
+        """Re-index one user after their skill ids change"""
+        new_skills = frozenset(skills or [])
+        with self.lock:
+            self._apply(user_id, new_skills)
+            self._record_update(user_id, new_skills)
+    
+    def _apply(self, user_id, new_skills):
+        old_skills = self.user_skills.pop(user_id, frozenset())
+        for skill in old_skills - new_skills:
+            holders = self.postings.get(skill)
+            if holders is not None:
+                holders.discard(user_id)
+                if not holders:
+                    del self.postings[skill]
+        for skill in new_skills - old_skills:
+            self.postings.setdefault(skill, set()).add(user_id)
+        if new_skills:
+            self.user_skills[user_id] = new_skills
+        if self.lsh is not None:
+            self.lsh.update(user_id, new_skills)
+    
+    def remove_user(self, user_id):
+        """Drop a user that no longer exists"""
+        self.update_user(user_id, [])
+    
+    def skill_count(self, user_id):
+        with self.lock:
+            return len(self.user_skills.get(user_id, ()))
+    
+    def skills_of(self, user_id):
+        """Skill ids currently indexed for a user"""
+        self._ensure_fresh()
+        with self.lock:
+            return self.user_skills.get(user_id, frozenset())
+    
+    def candidates(self, user_id, skills):
+        """Users sharing at least one of `skills`, with the skill ids they share
+        
+        Only the posting lists of the given skills are visited, so the cost
+        grows with the number of overlapping users rather than all users. In
+        approximate mode only the users in the same LSH buckets are visited.
+        """
+        self._ensure_fresh()
+        shared = {}
+        with self.lock:
+            if self.lsh is not None:
+                skills = frozenset(skills)
+                for other_id in self.lsh.query(skills):
+                    common = skills & self.user_skills.get(other_id, frozenset())
+                    if other_id != user_id and common:
+                        shared[other_id] = common
+                return shared
+            
+            for skill in skills:
+                for other_id in self.postings.get(skill, ()):
+                    if other_id != user_id:
+                        shared.setdefault(other_id, set()).add(skill)
+        return shared
+
+class SemanticSkillIndex(PeriodicIndex):
+    """Embeddings of users' skill profiles, kept in one contiguous float32 matrix
+    
+    Each profile is embedded once when the user's skills are written and
+    persisted (as raw float32 bytes) in the skill_embeddings collection, so
+    restarts only re-embed users whose skills changed. Vectors are unit
+    length, so one matrix-vector product gives every cosine similarity.
+    """
+    
+    def __init__(self, users_collection, embeddings_collection, model=None,
+                 refresh_seconds=SKILL_INDEX_REFRESH_SECONDS):
+        super().__init__(refresh_seconds)
+        self.users_collection = users_collection
+        self.embeddings_collection = embeddings_collection
+        self._model = model
+        self.matrix = np.zeros((0, 0), dtype=np.float32)  # Rows [0, size) are live
+        self.size = 0
+        self.row_ids = []  # row -> user id
+        self.rows = {}  # user id -> row
+    
+    @property
+    def model(self):
+        # Load lazily so exact-mode processes never pay for the model
+        if self._model is None:
+            self._model = SentenceTransformer(SKILL_EMBEDDING_MODEL, device="cpu")
+        return self._model
+    
+    @staticmethod
+    def profile_text(skill_ids):
+        return "Skills: " + ", ".join(sorted(skill_registry.name_of(skill_id) for skill_id in skill_ids))
+    
+    def embed(self, skill_sets):
+        """Unit-length float32 embeddings, one row per skill set"""
+        vectors = self.model.encode([self.profile_text(skills) for skills in skill_sets],
+                                    batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    
+    def _set_row(self, user_id, vector):
+        row = self.rows.get(user_id)
+        if row is None:
+            if self.size == len(self.matrix):
+                # Grow geometrically so appends stay amortized O(1)
+                grown = np.zeros((max(64, 2 * len(self.matrix)), len(vector)), dtype=np.float32)
+                if self.size:
+                    grown[:self.size] = self.matrix[:self.size]
+                self.matrix = grown
+            row = self.size
+            self.size += 1
+            self.rows[user_id] = row
+            self.row_ids.append(user_id)
+        self.matrix[row] = vector
+    
+    def _remove_row(self, user_id):
+        row = self.rows.pop(user_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            # Move the last row into the gap to keep live rows contiguous
+            self.matrix[row] = self.matrix[last]
+            moved_id = self.row_ids[last]
+            self.row_ids[row] = moved_id
+            self.rows[moved_id] = row
+        self.row_ids.pop()
+        self.size = last
+    
+    def _store(self, items):
+        """Persist (user id, skill ids, vector) triples"""
+        operations = [
+            UpdateOne({"_id": user_id},
+                      {"$set": {"skill_ids": sorted(skills), "vector": Binary(vector.tobytes())}},
+                      upsert=True)
+            for user_id, skills, vector in items
+        ]
+        if operations:
+            self.embeddings_collection.bulk_write(operations, ordered=False)
+    
+    def update_user(self, user_id, skills):
+        """Embed and store one user's profile right after their skills are written"""
+        if not skills:
+            self.embeddings_collection.delete_one({"_id": user_id})
+            vector = None
+        else:
+            vector = self.embed([skills])[0]
+            self._store([(user_id, skills, vector)])
+        with self.lock:
+            self._apply(user_id, vector)
+            self._record_update(user_id, vector)
+    
+    def _apply(self, user_id, vector):
+        if vector is None:
+            self._remove_row(user_id)
+        else:
+            self._set_row(user_id, vector)
+    
+    def load(self):
+        """Load stored vectors, embedding any user whose skills have no up-to-date vector"""
+        users = {
+            user["_id"]: sorted(user_skill_set(user))
+            for user in self.users_collection.find({"keywords": {"$exists": True, "$ne": []}},
+                                                   {"keywords": 1, "skill_ids": 1, "skill_version": 1})
+        }
+        vectors = {}
+        for doc in self.embeddings_collection.find({"_id": {"$in": list(users)}}):
+            if doc.get("skill_ids") == users[doc["_id"]]:
+                vectors[doc["_id"]] = np.frombuffer(doc["vector"], dtype=np.float32)
+        
+        missing = [user_id for user_id in users if user_id not in vectors]
+        for start in range(0, len(missing), 256):
+            batch = missing[start:start + 256]
+            embedded = self.embed([users[user_id] for user_id in batch])
+            self._store([(user_id, users[user_id], vector) for user_id, vector in zip(batch, embedded)])
+            vectors.update(zip(batch, embedded))
+        if missing:
+            print(f"🧠 Embedded skill profiles for {len(missing)} users")
+        
+        row_ids = list(vectors)
+        matrix = np.stack([vectors[user_id] for user_id in row_ids]) if row_ids else np.zeros((0, 0), dtype=np.float32)
+        with self.lock:
+            self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+            self.size = len(row_ids)
+            self.row_ids = row_ids
+            self.rows = {user_id: row for row, user_id in enumerate(row_ids)}
+            self._replay_updates()
+            self.built_at = time.monotonic()
+    
+    def neighbours(self, user_id, skills, k):
+        """The k users with the most similar skill profiles, as (user id, cosine) pairs"""
+        self._ensure_fresh()
+        if user_id not in self.rows:
+            self.update_user(user_id, skills)
+        with self.lock:
+            if self.size <= 1:
+                return []
+            live = self.matrix[:self.size]
+            scores = live @ live[self.rows[user_id]]
+            scores[self.rows[user_id]] = -np.inf  # Never match a user with themselves
+            k = min(k, self.size - 1)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self.row_ids[row], float(scores[row])) for row in top]
+
 class UserMatcher:
     """Match users based on skill overlap"""
     
-    def __init__(self, db_collection):
+    def __init__(self, db_collection, approximate=APPROXIMATE_MATCHING, semantic=SEMANTIC_MATCHING,
+                 embedding_model=None, overlap_weight=SEMANTIC_OVERLAP_WEIGHT, semantic_threshold=SEMANTIC_THRESHOLD):
         self.users_collection = db_collection
+        self.skill_index = SkillIndex(db_collection, approximate=approximate)
+        self.overlap_weight = overlap_weight
+        self.semantic_threshold = semantic_threshold
+        self.semantic_index = None
+        if semantic:
+            if SEMANTIC_AVAILABLE or embedding_model is not None:
+                self.semantic_index = SemanticSkillIndex(db_collection, db_collection.database["skill_embeddings"],
+                                                         embedding_model)
+            else:
+                print("⚠️  sentence-transformers not installed - semantic matching disabled, using skill overlap")
     
     def calculate_skill_similarity(self, user1_skills, user2_skills):
         """Calculate similarity based on common skills"""
@@ -144,8 +595,13 @@ class UserMatcher:
             return 0.0
         
         # Convert to lowercase for comparison
-        skills1 = {skill.lower().strip() for skill in user1_skills}
-        skills2 = {skill.lower().strip() for skill in user2_skills}
+        return self.calculate_normalized_similarity(set(normalize_skills(user1_skills)),
+                                                    set(normalize_skills(user2_skills)))
+    
+    def calculate_normalized_similarity(self, skills1, skills2):
+        """Overlap similarity of two sets of canonical skills (names or ids)"""
+        if not skills1 or not skills2:
+            return 0.0
         
         # Find common skills
         common_skills = skills1.intersection(skills2)
@@ -159,6 +615,54 @@ class UserMatcher:
         
         return similarity
     
+    def skill_display_names(self, skills):
+        """Skill id -> the user's own spelling of that skill"""
+        display = {}
+        for skill in skills:
+            display.setdefault(skill_registry.skill_id(skill_registry.canonicalize(skill)), skill)
+        return display
+    
+    def score_candidates(self, user_id, skills, threshold=0.1):
+        """(overlap count, similarity, other user id, shared skills) for users at or above threshold
+        
+        `skills` are skill ids; results are sorted by number of common skills
+        first, then by similarity.
+        """
+        skills = set(skills)
+        if not skills:
+            return []
+        
+        scored = []
+        for other_id, shared in self.skill_index.candidates(user_id, skills).items():
+            similarity = len(shared) / min(len(skills), max(1, self.skill_index.skill_count(other_id)))
+            if similarity >= threshold:
+                scored.append((len(shared), similarity, other_id, shared))
+        
+        scored.sort(key=lambda match: (match[0], match[1]), reverse=True)
+        return scored
+    
+    def score_semantic(self, user_id, skills, limit=10, threshold=None):
+        """Like score_candidates, but ranked by embedding similarity blended with skill overlap
+        
+        Only the nearest neighbours by embedding are rescored, so users with no
+        skill in common can still match ("PyTorch" vs "Deep Learning"). The
+        blended score is compared against `semantic_threshold` unless a
+        threshold on that scale is given.
+        """
+        if threshold is None:
+            threshold = self.semantic_threshold
+        skills = set(skills)
+        scored = []
+        for other_id, cosine in self.semantic_index.neighbours(user_id, skills, limit * SEMANTIC_CANDIDATES_PER_MATCH):
+            shared = skills & self.skill_index.skills_of(other_id)
+            overlap = self.calculate_normalized_similarity(skills, self.skill_index.skills_of(other_id))
+            score = (1 - self.overlap_weight) * cosine + self.overlap_weight * overlap
+            if score >= threshold:
+                scored.append((len(shared), score, other_id, shared))
+        
+        scored.sort(key=lambda match: match[1], reverse=True)
+        return scored
+    
     def find_similar_users(self, target_user_id, threshold=0.1, limit=10):
         """Find users with overlapping skills"""
         try:
@@ -183,44 +687,125 @@ class UserMatcher:
             
             print(f"🎯 Looking for users with skills similar to: {target_skills}")
             
-            similar_users = []
+            # The target's document was just read, so its index entry can be refreshed for free
+            target_normalized = user_skill_set(target_user)
+            self.skill_index.update_user(target_user_id, target_normalized)
             
-            # Get all other users with skills
-            other_users = self.users_collection.find({
-                "_id": {"$ne": target_user_id},
-                "keywords": {"$exists": True, "$ne": []}
-            })
-            
-            for user in other_users:
-                if 'keywords' in user and user['keywords']:
-                    # Calculate skill overlap
-                    similarity = self.calculate_skill_similarity(target_skills, user['keywords'])
-                    
-                    if similarity >= threshold:
-                        # Find actual common skills (preserve original case)
-                        target_lower = {s.lower().strip(): s for s in target_skills}
-                        user_lower = {s.lower().strip(): s for s in user['keywords']}
-                        common_skill_keys = set(target_lower.keys()).intersection(set(user_lower.keys()))
-                        common_skills = [target_lower[key] for key in common_skill_keys]
-                        
-                        print(f"✅ Match found: {user.get('name', 'Unknown')} - {len(common_skills)} common skills: {common_skills}")
-                        
-                        similar_users.append({
-                            'user': user,
-                            'similarity': similarity,
-                            'common_skills': common_skills,
-                            'overlap_count': len(common_skills)
-                        })
-            
-            # Sort by number of common skills first, then by similarity
-            similar_users.sort(key=lambda x: (x['overlap_count'], x['similarity']), reverse=True)
+            if self.semantic_index is not None:
+                # The overlap-scale threshold does not apply to embedding scores
+                scored = self.score_semantic(target_user_id, target_normalized, limit)
+            else:
+                # Score only users sharing at least one skill, straight from the index
+                scored = self.score_candidates(target_user_id, target_normalized, threshold)
+            scores = {user_id: similarity for _, similarity, user_id, _ in scored[:limit]}
+            print(f"🎉 Found {len(scored)} total matches")
             
-            print(f"🎉 Found {len(similar_users)} total matches")
-            return similar_users[:limit]
+            # Fetch documents for the returned matches only
+            top_ids = [user_id for _, _, user_id, _ in scored[:limit]]
+            users_by_id = {user["_id"]: user for user in self.users_collection.find({"_id": {"$in": top_ids}})}
+            
+            # Original spelling of the target's skills, for display only
+            target_display = self.skill_display_names(target_skills)
+            
+            similar_users = []
+            for user_id in top_ids:
+                user = users_by_id.get(user_id)
+                if not user or not user.get('keywords'):
+                    self.skill_index.remove_user(user_id)  # Deleted or cleared since the last rebuild
+                    continue
+                user_normalized = user_skill_set(user)
+                self.skill_index.update_user(user_id, user_normalized)
+                
+                # Find actual common skills (preserve original case)
+                common_skills = [target_display.get(key, key) for key in target_normalized & user_normalized]
+                
+                print(f"✅ Match found: {user.get('name', 'Unknown')} - {len(common_skills)} common skills: {common_skills}")
+                
+                if self.semantic_index is not None:
+                    similarity = scores[user_id]
+                else:
+                    similarity = self.calculate_normalized_similarity(target_normalized, user_normalized)
+                
+                similar_users.append({
+                    'user': user,
+                    'similarity': similarity,
+                    'common_skills': common_skills,
+                    'overlap_count': len(common_skills)
+                })
+            
+            return similar_users
             
         except Exception as e:
             print(f"❌ Error finding similar users: {e}")
             return []
+    
+    def find_all_similar_users(self, threshold=0.1, limit=10, block_size=BULK_MATCH_BLOCK_SIZE):
+        """Top matches for every user with skills, computed together
+        
+        Builds a binary user x skill CSR matrix once; a sparse product with its
+        transpose gives every pairwise overlap count, and dividing by the smaller
+        row sum gives the same overlap similarity as calculate_skill_similarity.
+        Rows are processed in blocks to bound memory, and each row's top `limit`
+        is picked with argpartition. Returns a list of (user, similar_users) pairs
+        in the format of find_similar_users.
+        """
+        users = list(self.users_collection.find({"keywords": {"$exists": True, "$ne": []}}))
+        if not users:
+            return []
+        
+        user_skill_sets = []
+        rows, cols = [], []
+        for row, user in enumerate(users):
+            skills = user_skill_set(user)
+            user_skill_sets.append(skills)
+            rows.extend([row] * len(skills))
+            cols.extend(skills)
+        
+        # Skill ids are dense, so they index matrix columns directly
+        matrix = sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+            shape=(len(users), max(cols) + 1)
+        )
+        matrix_t = matrix.T.tocsr()
+        skill_counts = np.asarray(matrix.sum(axis=1), dtype=np.float32).ravel()
+        k = min(limit, len(users) - 1)
+        
+        print(f"🧮 Bulk matching {len(users)} users over {matrix.shape[1]} skill ids")
+        
+        results = []
+        for start in range(0, len(users), block_size):
+            stop = min(start + block_size, len(users))
+            overlap = (matrix[start:stop] @ matrix_t).toarray()
+            overlap[np.arange(stop - start), np.arange(start, stop)] = 0  # Never match a user with themselves
+            
+            similarity = overlap / np.minimum(skill_counts[start:stop, None], skill_counts[None, :])
+            # Rank by overlap count, then similarity (similarity / 2 < 1 keeps the count dominant)
+            rank = np.where((overlap > 0) & (similarity >= threshold), overlap + similarity / 2, -1.0)
+            
+            if k <= 0:
+                top = np.empty((stop - start, 0), dtype=np.intp)
+            else:
+                top = np.argpartition(-rank, k - 1, axis=1)[:, :k]
+            
+            for offset in range(stop - start):
+                row = start + offset
+                candidates = [col for col in top[offset] if rank[offset, col] > 0]
+                candidates.sort(key=lambda col: rank[offset, col], reverse=True)
+                
+                target_lower = self.skill_display_names(users[row]['keywords'])
+                similar_users = []
+                for col in candidates:
+                    common_keys = user_skill_sets[row] & user_skill_sets[col]
+                    common_skills = [target_lower.get(key, skill_registry.name_of(key)) for key in common_keys]
+                    similar_users.append({
+                        'user': users[col],
+                        'similarity': float(similarity[offset, col]),
+                        'common_skills': common_skills,
+                        'overlap_count': len(common_skills)
+                    })
+                results.append((users[row], similar_users))
+        
+        return results
 
 class MatchmakingNotifier:
     """Send email notifications for user matches"""
@@ -279,15 +864,12 @@ class MatchmakingNotifier:
         
         try:
             print(f"🤖 Generating consolidated match email for {user['name']} ({total_matches} matches)...")
-            print("⏳ Applying rate limiting with key rotation (6 seconds)...")
-            time.sleep(6)  # One API call instead of N calls per user!
             
-            # Use the API manager to get a configured model with rotated key
-            model = api_manager.get_configured_model("gemini-2.0-flash-exp")
-            response = model.generate_content(prompt)
+            # One API call instead of N calls per user, rate limited per key
+            email_content = api_manager.generate(prompt, "gemini-2.0-flash-exp")
             
             print(f"✅ Consolidated match email generated successfully")
-            return response.text
+            return email_content
         except Exception as e:
             print(f"❌ Error generating consolidated match email: {e}")
             print(f"⚠️  Using fallback consolidated template...")
@@ -327,10 +909,8 @@ P.S. The best hackathon projects come from great teamwork - choose wisely! 🏆"
             
             msg.attach(MIMEText(email_content, 'plain'))
             
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.sender_email, self.sender_password)
-                server.send_message(msg)
+            # Reuses a warm, authenticated connection shared with the outreach agent
+            smtp_pool.send_message(msg)
             
             print(f"✅ Consolidated match notification sent successfully ({total_matches} matches)")
             return True
@@ -365,6 +945,8 @@ class MatchmakingSystem:
         self.db = self.client["hackathon_twin"]
         self.users_collection = self.db["users"]
         self.matches_collection = self.db["matches"]  # Store match history
+        self.match_lists_collection = self.db["match_lists"]  # Current top matches per user, keyed by user id
+        self.match_lists_collection.create_index("matches.user_id")
         
         # Initialize components
         self.skill_extractor = SkillExtractor()
@@ -435,6 +1017,7 @@ class MatchmakingSystem:
                 {
                     "$set": {
                         "keywords": updated_skills,
+                        **skill_fields(updated_skills),
                         "resume_processed": True,
                         "resume_processed_date": datetime.now()
                     }
@@ -446,17 +1029,126 @@ class MatchmakingSystem:
             else:
                 print(f"⚠️ No database changes made (maybe skills were the same)")
             
+            gained = self.refresh_match_lists(user_id, user_skill_set({"keywords": updated_skills}))
+            
             return {
                 "success": True,
                 "message": f"Successfully extracted {len(extracted_skills)} skills",
                 "extracted_skills": extracted_skills,
-                "total_skills": len(updated_skills)
+                "total_skills": len(updated_skills),
+                "users_with_new_matches": len(gained)
             }
             
         except Exception as e:
             print(f"❌ Error processing resume: {e}")
             return {"success": False, "message": f"Error processing resume: {str(e)}"}
     
+    @staticmethod
+    def _match_entry(overlap_count, similarity, other_id, shared):
+        return {
+            "user_id": other_id,
+            "similarity": similarity,
+            "overlap_count": overlap_count,
+            "common_skills": sorted(skill_registry.name_of(skill_id) for skill_id in shared)
+        }
+    
+    @staticmethod
+    def _same_matches(entries, previous):
+        """Whether two match lists hold the same entries (tied entries may be ordered differently)"""
+        return len(entries) == len(previous) and {entry["user_id"]: entry for entry in entries} == {
+            entry["user_id"]: entry for entry in previous}
+    
+    def refresh_match_lists(self, user_id, skills, threshold=MATCH_THRESHOLD, limit=MATCH_LIST_SIZE):
+        """Incrementally update stored match lists after one user's skill ids change
+        
+        Only users sharing an old or new skill with this user can have their
+        ranking of this user change, so only their lists are touched: this user
+        is merged into (or dropped from) each list, and a list is rescored from
+        the skill index only when this user left a full list or the list was
+        never stored. Users who gained a match are added to that user's
+        `new_matches` for targeted notification. Returns those user ids.
+        
+        A list stored for the first time is only seeded: its entries are not
+        news to anyone, so they are not flagged as new matches. Lists that did
+        not change are not rewritten.
+        """
+        index = self.matcher.skill_index
+        old_skills = index.skills_of(user_id)
+        index.update_user(user_id, skills)
+        new_skills = index.skills_of(user_id)
+        if self.matcher.semantic_index is not None and new_skills != old_skills:
+            self.matcher.semantic_index.update_user(user_id, new_skills)
+        
+        # Everyone whose similarity to this user may have changed, plus anyone
+        # already listing this user (in approximate mode they may no longer be candidates)
+        affected = set(index.candidates(user_id, old_skills)) | set(index.candidates(user_id, new_skills))
+        affected.update(doc["_id"] for doc in self.match_lists_collection.find({"matches.user_id": user_id}, {"_id": 1}))
+        affected.discard(user_id)
+        own_matches = self.matcher.score_candidates(user_id, new_skills, threshold)
+        new_scores = {other_id: (overlap, similarity, shared) for overlap, similarity, other_id, shared in own_matches}
+        
+        stored = {
+            doc["_id"]: doc.get("matches", [])
+            for doc in self.match_lists_collection.find({"_id": {"$in": list(affected | {user_id})}}, {"matches": 1})
+        }
+        
+        lists = {user_id: [self._match_entry(*match) for match in own_matches[:limit]]}
+        for other_id in affected:
+            previous = stored.get(other_id)
+            old_entry = next((entry for entry in previous or [] if entry["user_id"] == user_id), None)
+            new_score = new_scores.get(other_id)
+            
+            lost_rank = old_entry is not None and (
+                new_score is None or (new_score[0], new_score[1]) < (old_entry["overlap_count"], old_entry["similarity"])
+            )
+            if previous is None or (lost_rank and len(previous) >= limit):
+                # Someone outside the stored top list may now belong in it - rescore this user
+                rescored = self.matcher.score_candidates(other_id, index.skills_of(other_id), threshold)
+                lists[other_id] = [self._match_entry(*match) for match in rescored[:limit]]
+                continue
+            
+            entries = [entry for entry in previous if entry["user_id"] != user_id]
+            if new_score is not None:
+                overlap, similarity, shared = new_score
+                entries.append(self._match_entry(overlap, similarity, user_id, shared))
+                entries.sort(key=lambda entry: (entry["overlap_count"], entry["similarity"]), reverse=True)
+            lists[other_id] = entries[:limit]
+        
+        gained = []
+        operations = []
+        now = datetime.now()
+        for list_user_id, entries in lists.items():
+            previous = stored.get(list_user_id)
+            if previous is not None and self._same_matches(entries, previous):
+                continue
+            update = {"$set": {"matches": entries, "updated_at": now}}
+            new_ids = [entry["user_id"] for entry in entries]
+            added = set(new_ids) - {entry["user_id"] for entry in previous} if previous is not None else set()
+            if added:
+                gained.append(list_user_id)
+                update["$addToSet"] = {"new_matches": {"$each": [uid for uid in new_ids if uid in added]}}
+            operations.append(UpdateOne({"_id": list_user_id}, update, upsert=True))
+        
+        if operations:
+            self.match_lists_collection.bulk_write(operations, ordered=False)
+        print(f"♻️  Refreshed match lists for {len(lists)} users, {len(gained)} gained new matches")
+        return gained
+    
+    def get_users_with_new_matches(self):
+        """Users whose match list gained someone since they were last notified"""
+        return list(self.match_lists_collection.find({"new_matches.0": {"$exists": True}}, {"new_matches": 1}))
+    
+    def notify_new_matches(self, similarity_threshold=0.1):
+        """Send match notifications only to users who gained new matches"""
+        totals = {"processed_users": 0, "total_matches": 0, "total_notifications": 0}
+        for doc in self.get_users_with_new_matches():
+            result = self.find_and_notify_matches(doc["_id"], similarity_threshold)
+            if result['success']:
+                totals["processed_users"] += 1
+                totals["total_matches"] += result.get('matches_found', 0)
+                totals["total_notifications"] += result.get('notifications_sent', 0)
+        return totals
+    
     def find_and_notify_matches(self, user_id, similarity_threshold=0.1):
         """Find matches for user and send ONE CONSOLIDATED notification - MUCH more efficient!"""
         try:
@@ -479,7 +1171,21 @@ class MatchmakingSystem:
             
             # Find similar users
             similar_users = self.matcher.find_similar_users(user_id, similarity_threshold)
+            return self.notify_and_record_matches(user, similar_users)
             
+        except Exception as e:
+            print(f"❌ Error in find_and_notify_matches: {e}")
+            return {
+                "success": False,
+                "message": f"Error finding matches: {str(e)}",
+                "matches_found": 0,
+                "notifications_sent": 0
+            }
+    
+    def notify_and_record_matches(self, user, similar_users):
+        """Send one consolidated email for a user's matches and store the match records"""
+        try:
+            user_id = user['_id']
             if not similar_users:
                 return {
                     "success": True,
@@ -499,6 +1205,7 @@ class MatchmakingSystem:
             ):
                 notifications_sent = 1  # Only ONE email sent instead of N emails!
                 print(f"✅ Sent consolidated email with {len(similar_users)} matches to {user['name']}")
+                self.match_lists_collection.update_one({"_id": user_id}, {"$set": {"new_matches": []}})
             
             # Record matches in database (but don't duplicate notifications)
             match_records = []
@@ -531,14 +1238,47 @@ class MatchmakingSystem:
             }
             
         except Exception as e:
-            print(f"❌ Error in find_and_notify_matches: {e}")
+            print(f"❌ Error in notify_and_record_matches: {e}")
             return {
                 "success": False,
-                "message": f"Error finding matches: {str(e)}",
+                "message": f"Error notifying matches: {str(e)}",
                 "matches_found": 0,
                 "notifications_sent": 0
             }
     
+    def bulk_find_and_notify_matches(self, similarity_threshold=0.1):
+        """Match every user with skills in one vectorized pass, then notify each"""
+        all_matches = self.matcher.find_all_similar_users(similarity_threshold, MATCH_LIST_SIZE)
+        
+        # Store the full match lists so later skill changes can be applied incrementally
+        now = datetime.now()
+        operations = [
+            UpdateOne(
+                {"_id": user['_id']},
+                {"$set": {
+                    "matches": [
+                        self._match_entry(match['overlap_count'], match['similarity'], match['user']['_id'],
+                                          user_skill_set(user) & user_skill_set(match['user']))
+                        for match in similar_users
+                    ],
+                    "updated_at": now
+                }},
+                upsert=True
+            )
+            for user, similar_users in all_matches
+        ]
+        if operations:
+            self.match_lists_collection.bulk_write(operations, ordered=False)
+        
+        totals = {"processed_users": 0, "total_matches": 0, "total_notifications": 0}
+        for user, similar_users in all_matches:
+            result = self.notify_and_record_matches(user, similar_users)
+            if result['success']:
+                totals["processed_users"] += 1
+                totals["total_matches"] += result.get('matches_found', 0)
+                totals["total_notifications"] += result.get('notifications_sent', 0)
+        return totals
+    
     def get_user_matches(self, user_id):
         """Get match history for a user"""
         try:
@@ -8,6 +8,10 @@ import os
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import tempfile
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from skills import skill_fields
 
 # Import the matchmaking system
 from .matchmaker import MatchmakingSystem
@@ -101,6 +105,7 @@ class MatchmakingRoutes:
                     'email': data['email'],
                     'job_title': data['job_title'],
                     'keywords': data.get('skills', []),  # Skills can be empty initially
+                    **skill_fields(data.get('skills', [])),  # Canonical names and ids, precomputed for matching
                     'resume_processed': False,  # No resume uploaded yet
                     'created_date': datetime.now(),
                     'source': 'manual_entry'  # Mark as manually added
@@ -109,6 +114,7 @@ class MatchmakingRoutes:
                 # Insert user
                 result = self.users_collection.insert_one(new_user)
                 user_id = result.inserted_id
+                gained = self.matchmaker.refresh_match_lists(user_id, new_user['skill_ids'])
                 
                 # Auto-trigger matchmaking if user has skills
                 auto_match = data.get('auto_match', True)
@@ -122,6 +128,7 @@ class MatchmakingRoutes:
                     'message': f'User {data["name"]} added successfully',
                     'user_id': str(user_id),
                     'skills_count': len(new_user['keywords']),
+                    'users_with_new_matches': len(gained),
                     'matchmaking': match_result
                 })
                 
@@ -245,43 +252,52 @@ class MatchmakingRoutes:
         def bulk_matchmaking():
             """Run matchmaking for all users with skills (resume processed or manually added)"""
             try:
-                # Get all users who have skills (either from resume or manual entry)
-                users_with_skills = list(self.users_collection.find({
-                    'keywords': {'$exists': True, '$ne': []}
-                }))
+                # Match all users who have skills (either from resume or manual entry) in one pass
+                totals = self.matchmaker.bulk_find_and_notify_matches()
                 
-                if not users_with_skills:
+                if not totals['processed_users']:
                     return jsonify({
                         'success': False, 
                         'message': 'No users with skills found'
                     })
                 
-                total_matches = 0
-                total_notifications = 0
-                processed_users = 0
-                
-                for user in users_with_skills:
-                    try:
-                        result = self.matchmaker.find_and_notify_matches(user['_id'])
-                        if result['success']:
-                            total_matches += result.get('matches_found', 0)
-                            total_notifications += result.get('notifications_sent', 0)
-                            processed_users += 1
-                    except Exception as e:
-                        print(f"❌ Error processing user {user['name']}: {e}")
-                        continue
-                
                 return jsonify({
                     'success': True,
                     'message': f'Bulk matchmaking completed',
-                    'processed_users': processed_users,
-                    'total_matches': total_matches,
-                    'total_notifications': total_notifications
+                    'processed_users': totals['processed_users'],
+                    'total_matches': totals['total_matches'],
+                    'total_notifications': totals['total_notifications']
                 })
                 
             except Exception as e:
                 return jsonify({'success': False, 'message': f'Error in bulk matchmaking: {str(e)}'})
         
+        @self.app.route('/api/matchmaking/new-matches')
+        def new_matches():
+            """Users whose stored match list gained someone since their last notification"""
+            try:
+                users = self.matchmaker.get_users_with_new_matches()
+                return jsonify({
+                    'success': True,
+                    'users': [
+                        {'user_id': str(doc['_id']), 'new_matches': [str(uid) for uid in doc['new_matches']]}
+                        for doc in users
+                    ]
+                })
+                
+            except Exception as e:
+                return jsonify({'success': False, 'message': f'Error getting new matches: {str(e)}'})
+        
+        @self.app.route('/matchmaking/notify-new-matches', methods=['POST'])
+        def notify_new_matches():
+            """Notify only users who gained new matches"""
+            try:
+                totals = self.matchmaker.notify_new_matches()
+                return jsonify({'success': True, 'message': 'Targeted notifications sent', **totals})
+                
+            except Exception as e:
+                return jsonify({'success': False, 'message': f'Error notifying new matches: {str(e)}'})
+        
         @self.app.route('/api/matchmaking/stats')
         def matchmaking_stats():
             """Get matchmaking statistics"""
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for MinHash LSH candidate lookup
+"""
+
+from matchmaking_users.matchmaker import MinHashLSH
+
+USERS = {
+    "alice": {1, 2, 3, 4},
+    "bob": {1, 2, 3, 4},
+    "carol": {100, 101, 102, 103},
+    "dave": set()
+}
+
+def test_identical_skill_sets_always_collide():
+    """Users with the same skills share every band"""
+    lsh = MinHashLSH()
+    lsh.build(USERS)
+    assert {"alice", "bob"} <= lsh.query({1, 2, 3, 4})
+
+def test_disjoint_skill_sets_do_not_collide():
+    """Users with no skills in common are not returned"""
+    lsh = MinHashLSH()
+    lsh.build(USERS)
+    assert "carol" not in lsh.query({1, 2, 3, 4})
+    assert lsh.query({100, 101, 102, 103}) == {"carol"}
+
+def test_empty_skill_sets_are_never_indexed_or_matched():
+    """An empty query finds nothing and users without skills are skipped"""
+    lsh = MinHashLSH()
+    lsh.build(USERS)
+    assert lsh.query(set()) == set()
+    assert "dave" not in lsh.built_positions
+
+def test_build_with_no_users():
+    """An index built from nothing answers queries with nothing"""
+    lsh = MinHashLSH()
+    lsh.build({})
+    assert lsh.query({1, 2}) == set()
+
+def test_update_replaces_a_built_users_signature():
+    """After an update a user is found by their new skills, not their old ones"""
+    lsh = MinHashLSH()
+    lsh.build(USERS)
+    lsh.update("alice", {100, 101, 102, 103})
+    assert lsh.query({1, 2, 3, 4}) == {"bob"}
+    assert lsh.query({100, 101, 102, 103}) == {"alice", "carol"}
+
+def test_update_twice_drops_the_intermediate_signature():
+    """Only a user's latest update is indexed"""
+    lsh = MinHashLSH()
+    lsh.build(USERS)
+    lsh.update("erin", {1, 2, 3, 4})
+    lsh.update("erin", {100, 101, 102, 103})
+    assert "erin" not in lsh.query({1, 2, 3, 4})
+    assert "erin" in lsh.query({100, 101, 102, 103})
+
+def test_update_with_no_skills_removes_the_user():
+    """An empty update takes the user out of the index"""
+    lsh = MinHashLSH()
+    lsh.build(USERS)
+    lsh.update("bob", set())
+    lsh.update("erin", {1, 2, 3, 4})
+    lsh.update("erin", set())
+    assert lsh.query({1, 2, 3, 4}) == {"alice"}
+
+def test_rebuild_clears_updates():
+    """A new build starts from the given users only"""
+    lsh = MinHashLSH()
+    lsh.build(USERS)
+    lsh.update("erin", {1, 2, 3, 4})
+    lsh.build({"alice": {1, 2, 3, 4}})
+    assert lsh.query({1, 2, 3, 4}) == {"alice"}
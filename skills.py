@@ -0,0 +1,270 @@
+"""
+Skill Registry
+Canonical skill names, alias resolution and compact integer skill ids
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+from pymongo import MongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Optional JSON file of extra aliases: {"canonical name": ["alias", ...], ...}
+SKILL_ALIASES_FILE = os.getenv("SKILL_ALIASES_FILE")
+
+# Canonical name -> common spellings, abbreviations and variants
+DEFAULT_SKILL_ALIASES = {
+    "javascript": ["js", "java script", "ecmascript", "es6", "es2015", "vanilla js", "vanilla javascript"],
+    "typescript": ["ts"],
+    "node.js": ["node", "nodejs", "node js"],
+    "react": ["react.js", "reactjs", "react js"],
+    "react native": ["react-native"],
+    "vue": ["vue.js", "vuejs", "vue js"],
+    "angular": ["angular.js", "angularjs", "angular js"],
+    "next.js": ["next", "nextjs", "next js"],
+    "express": ["express.js", "expressjs"],
+    "python": ["py", "python3", "python 3"],
+    "django": ["django rest framework", "drf"],
+    "flask": [],
+    "fastapi": ["fast api"],
+    "java": [],
+    "spring boot": ["springboot"],
+    "c++": ["cpp", "cplusplus", "c plus plus"],
+    "c#": ["csharp", "c sharp"],
+    ".net": ["dotnet", "dot net", "asp.net", "asp.net core"],
+    "go": ["golang"],
+    "rust": [],
+    "sql": ["structured query language"],
+    "postgresql": ["postgres", "postgre sql", "psql"],
+    "mysql": ["my sql"],
+    "mongodb": ["mongo", "mongo db"],
+    "html": ["html5"],
+    "css": ["css3"],
+    "aws": ["amazon web services"],
+    "gcp": ["google cloud", "google cloud platform"],
+    "azure": ["microsoft azure"],
+    "docker": [],
+    "kubernetes": ["k8s", "kube"],
+    "ci/cd": ["cicd", "ci cd", "continuous integration", "continuous delivery", "continuous deployment"],
+    "git": ["github", "gitlab", "version control"],
+    "machine learning": ["ml"],
+    "deep learning": ["dl", "neural networks", "neural network"],
+    "artificial intelligence": ["ai"],
+    "natural language processing": ["nlp"],
+    "computer vision": ["image recognition"],
+    "large language models": ["llm", "llms", "large language model"],
+    "generative ai": ["genai", "gen ai"],
+    "data science": ["data scientist"],
+    "data analysis": ["data analytics", "data analyst"],
+    "tensorflow": ["tf", "tensor flow"],
+    "pytorch": ["torch", "py torch"],
+    "scikit-learn": ["sklearn", "scikit learn", "scikit"],
+    "pandas": [],
+    "numpy": [],
+    "blockchain": ["web3"],
+    "ui/ux design": ["ui/ux", "ui ux", "ux", "ui", "ux design", "ui design", "user experience", "user interface design"],
+    "product management": ["product manager", "pm"],
+}
+
+# Words that qualify a skill without changing which skill it is ("React framework", "Python programming")
+IGNORABLE_TOKENS = {
+    "framework", "frameworks", "library", "libraries", "language", "languages", "programming", "development",
+    "developer", "dev", "engineering", "basics", "fundamentals", "experience", "with", "in", "of", "using",
+    "advanced", "proficient", "proficiency", "skills", "skill", "knowledge", "expert", "expertise",
+    "beginner", "intermediate", "the"
+}
+VERSION_TOKEN = re.compile(r"^v?\d+[\dx.]*$")
+TOKEN_PATTERN = re.compile(r"[a-z0-9+#/]+(?:\.[a-z0-9+#]+)*")
+PARENTHETICAL = re.compile(r"\([^)]*\)")
+
+def normalize_skill(skill):
+    """Case/whitespace-insensitive form used to compare skills that have no known alias"""
+    return " ".join(skill.lower().split())
+
+def _tokens(text):
+    """Lowercased word tokens with parentheticals removed and dots inside words dropped ("Node.js" -> "nodejs")"""
+    text = PARENTHETICAL.sub(" ", text.lower())
+    return [token.replace(".", "") for token in TOKEN_PATTERN.findall(text)]
+
+class SkillRegistry:
+    """Maps free-form skills to canonical names and stable integer ids
+
+    Single- and multi-word aliases resolve through a precompiled dict keyed by
+    the token sequence (and its space-free form); a token trie finds a known
+    alias inside longer phrases such as "Machine Learning Engineering".
+    Canonical names get ids from a Mongo-backed counter the first time they
+    are ingested, so every process shares one compact vocabulary.
+
+    `version` fingerprints the alias table, so documents whose stored
+    `skill_ids` came from a different table can be recognised and re-derived.
+    """
+
+    def __init__(self, aliases=None, collection=None):
+        self.lock = threading.Lock()
+        self.alias_lookup = {}  # token key -> canonical name
+        self.trie = {}  # token -> child node; a node's None key holds the canonical name
+        self.canonical_cache = {}  # raw skill -> canonical name
+        self._version = None
+        for canonical, variants in (aliases or DEFAULT_SKILL_ALIASES).items():
+            self.add_alias(canonical, canonical)
+            for variant in variants:
+                self.add_alias(variant, canonical)
+
+        self._collection = collection
+        self.ids = {}  # canonical name -> id
+        self.names = {}  # id -> canonical name
+
+    @classmethod
+    def from_env(cls):
+        """Registry with the default aliases plus SKILL_ALIASES_FILE; ids live in the `skills` collection"""
+        aliases = {name: list(variants) for name, variants in DEFAULT_SKILL_ALIASES.items()}
+        if SKILL_ALIASES_FILE and os.path.exists(SKILL_ALIASES_FILE):
+            with open(SKILL_ALIASES_FILE, encoding="utf-8") as f:
+                for name, variants in json.load(f).items():
+                    aliases.setdefault(name, []).extend(variants)
+        return cls(aliases)
+
+    @property
+    def collection(self):
+        # Connect lazily so importing this module never needs a database
+        if self._collection is None:
+            client = MongoClient(os.getenv("MONGODB_URI"))
+            self._collection = client["hackathon_twin"]["skills"]
+            self._collection.create_index("skill_id", unique=True)
+        return self._collection
+
+    def add_alias(self, alias, canonical):
+        """Register one more spelling of a canonical skill"""
+        tokens = _tokens(alias)
+        if not tokens:
+            return
+        self.alias_lookup[" ".join(tokens)] = canonical
+        self.alias_lookup["".join(tokens)] = canonical
+        node = self.trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[None] = canonical
+        self.canonical_cache.clear()
+        self._version = None
+
+    @property
+    def version(self):
+        """Short hash of everything canonicalization depends on"""
+        if self._version is None:
+            table = json.dumps([sorted(self.alias_lookup.items()), sorted(IGNORABLE_TOKENS)])
+            self._version = hashlib.sha1(table.encode("utf-8")).hexdigest()[:12]
+        return self._version
+
+    def _longest_alias(self, tokens, start):
+        """Canonical name and end position of the longest alias starting at tokens[start]"""
+        node = self.trie
+        match = None
+        for position in range(start, len(tokens)):
+            node = node.get(tokens[position])
+            if node is None:
+                break
+            if None in node:
+                match = (node[None], position + 1)
+        return match
+
+    def canonicalize(self, skill):
+        """Canonical name for a free-form skill (its normalized text when no alias applies)"""
+        canonical = self.canonical_cache.get(skill)
+        if canonical is None:
+            canonical = self._resolve(skill)
+            if len(self.canonical_cache) < 100000:
+                self.canonical_cache[skill] = canonical
+        return canonical
+
+    def _resolve(self, skill):
+        tokens = _tokens(skill)
+        if not tokens:
+            return normalize_skill(skill)
+
+        canonical = self.alias_lookup.get(" ".join(tokens)) or self.alias_lookup.get("".join(tokens))
+        if canonical:
+            return canonical
+
+        # Scan for known aliases; accept one only if everything else is qualifiers or versions
+        found = set()
+        position = 0
+        while position < len(tokens):
+            match = self._longest_alias(tokens, position)
+            if match:
+                found.add(match[0])
+                position = match[1]
+            elif tokens[position] in IGNORABLE_TOKENS or VERSION_TOKEN.match(tokens[position]):
+                position += 1
+            else:
+                return normalize_skill(skill)
+        if len(found) == 1:
+            return found.pop()
+        return normalize_skill(skill)
+
+    def _load_id(self, name):
+        doc = self.collection.find_one({"_id": name})
+        if doc is None:
+            counter = self.collection.find_one_and_update(
+                {"_id": "__next_skill_id__"},
+                {"$inc": {"seq": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            try:
+                self.collection.insert_one({"_id": name, "skill_id": counter["seq"]})
+                doc = {"_id": name, "skill_id": counter["seq"]}
+            except DuplicateKeyError:
+                doc = self.collection.find_one({"_id": name})  # Another process registered it first
+        return doc["skill_id"]
+
+    def skill_id(self, name):
+        """Integer id of a canonical name, registering it on first sight"""
+        skill_id = self.ids.get(name)
+        if skill_id is None:
+            skill_id = self._load_id(name)
+            with self.lock:
+                self.ids[name] = skill_id
+                self.names[skill_id] = name
+        return skill_id
+
+    def name_of(self, skill_id):
+        """Canonical name for an id"""
+        name = self.names.get(skill_id)
+        if name is None:
+            doc = self.collection.find_one({"skill_id": skill_id})
+            name = doc["_id"] if doc else str(skill_id)
+            with self.lock:
+                self.names[skill_id] = name
+                self.ids.setdefault(name, skill_id)
+        return name
+
+# Global instance
+skill_registry = SkillRegistry.from_env()
+
+def normalize_skills(skills):
+    """Distinct canonical skill names in first-seen order, as stored in a user's `normalized_skills`"""
+    return list(dict.fromkeys(skill_registry.canonicalize(skill) for skill in skills or []))
+
+def skill_fields(skills):
+    """Precomputed matching fields to store alongside a user's raw `keywords`"""
+    names = normalize_skills(skills)
+    return {
+        "normalized_skills": names,
+        "skill_ids": [skill_registry.skill_id(name) for name in names],
+        "skill_version": skill_registry.version
+    }
+
+def has_current_skill_fields(user):
+    """Whether a user document's stored skill ids came from the current alias table"""
+    return "skill_ids" in user and user.get("skill_version") == skill_registry.version
+
+def user_skill_set(user):
+    """A user document's skill ids, re-derived from its raw keywords when missing or from an older alias table"""
+    if has_current_skill_fields(user):
+        return set(user["skill_ids"])
+    return set(skill_fields(user.get("keywords"))["skill_ids"])
@@ -0,0 +1,167 @@
+"""
+SMTP Connection Pool
+Shares warm, authenticated SMTP sessions between the outreach and matchmaking mailers
+"""
+import os
+import queue
+import smtplib
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "3"))
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+
+# Errors that mean the session is gone and a fresh connection may succeed
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+class DeliveryUnknownError(smtplib.SMTPException):
+    """The session dropped after DATA was sent, so the server may already have accepted the message"""
+
+class TrackingSMTP(smtplib.SMTP):
+    """smtplib.SMTP that records whether the current message got as far as the DATA command"""
+
+    data_started = False
+
+    def data(self, msg):
+        self.data_started = True
+        return super().data(msg)
+
+class PooledConnection:
+    """An authenticated SMTP session and how many messages it has sent"""
+
+    def __init__(self, server):
+        self.server = server
+        self.messages_sent = 0
+
+class SMTPConnectionPool:
+    """Thread-safe pool of authenticated SMTP connections"""
+
+    def __init__(self, host=SMTP_SERVER, port=SMTP_PORT, username=None, password=None,
+                 size=SMTP_POOL_SIZE, max_messages_per_connection=SMTP_MAX_MESSAGES_PER_CONNECTION,
+                 timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = max(1, size)
+        self.max_messages_per_connection = max_messages_per_connection
+        self.timeout = timeout
+
+        self.idle = queue.LifoQueue()  # Most recently used (warmest) connection first
+        self.slots = threading.BoundedSemaphore(self.size)  # Caps open connections
+
+    @classmethod
+    def from_env(cls):
+        """Pool using SENDER_EMAIL / SENDER_PASSWORD; connections open lazily"""
+        return cls(username=os.getenv("SENDER_EMAIL"), password=os.getenv("SENDER_PASSWORD"))
+
+    def _connect(self):
+        """Open, secure and authenticate a new session"""
+        server = TrackingSMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.starttls()
+            server.login(self.username, self.password)
+        except Exception:
+            self._close(server)
+            raise
+        print(f"📬 Opened SMTP connection to {self.host}:{self.port}")
+        return PooledConnection(server)
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _is_reusable(self, connection):
+        """NOOP health check plus the per-connection message cap"""
+        if connection.messages_sent >= self.max_messages_per_connection:
+            return False
+        try:
+            return connection.server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Take a healthy connection from the pool, reconnecting if needed"""
+        self.slots.acquire()
+        try:
+            while True:
+                try:
+                    connection = self.idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if self._is_reusable(connection):
+                    return connection
+                self._close(connection.server)
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, connection, broken=False):
+        """Return a connection to the pool (or drop it if it failed)"""
+        if broken:
+            self._close(connection.server)
+        else:
+            self.idle.put(connection)
+        self.slots.release()
+
+    def warm_up(self, count=None):
+        """Open connections ahead of a campaign so the first sends skip the handshake"""
+        connections = []
+        try:
+            for _ in range(min(count or self.size, self.size)):
+                connections.append(self.acquire())
+        finally:
+            for connection in connections:
+                self.release(connection)
+
+    def send_message(self, msg, retries=1):
+        """Send a message over a pooled connection, reconnecting after a dropped session
+
+        Only failures before DATA (MAIL/RCPT) are retried. Once DATA has gone
+        out the server may have accepted the message, so a dropped session
+        raises DeliveryUnknownError instead of risking a second copy.
+        """
+        for attempt in range(retries + 1):
+            connection = self.acquire()
+            connection.server.data_started = False
+            try:
+                connection.server.send_message(msg)
+            except CONNECTION_ERRORS as e:
+                self.release(connection, broken=True)
+                if getattr(connection.server, "data_started", False):
+                    raise DeliveryUnknownError(f"Connection lost after DATA, delivery unknown: {e}") from e
+                if attempt == retries:
+                    raise
+                print(f"🔌 SMTP connection dropped ({e}), reconnecting...")
+                continue
+            except Exception:
+                # The session itself is fine (e.g. recipient refused) - keep it
+                self.release(connection)
+                raise
+            connection.messages_sent += 1
+            self.release(connection)
+            return
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                connection = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(connection.server)
+
+# Global instance
+smtp_pool = SMTPConnectionPool.from_env()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for batching, flushing and failure handling in BulkWriteBuffer
+"""
+
+import time
+import pytest
+
+from bulk_buffer import BulkWriteBuffer
+
+class RecordingWriter:
+    """Write callback that records batches and can fail its first few calls"""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+
+    def __call__(self, items):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("write failed")
+        self.batches.append(list(items))
+
+def test_flushes_when_batch_is_full():
+    """Reaching max_items writes the batch without waiting for the timer"""
+    writer = RecordingWriter()
+    with BulkWriteBuffer(writer, max_items=3, max_delay_ms=60000) as buffer:
+        for item in range(7):
+            buffer.add(item)
+        assert writer.batches == [[0, 1, 2], [3, 4, 5]]
+    assert writer.batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert buffer.flushes == 3
+    assert buffer.flushed_items == 7
+
+def test_flushes_partial_batch_after_delay():
+    """A partial batch is written once its oldest item is max_delay_ms old"""
+    writer = RecordingWriter()
+    with BulkWriteBuffer(writer, max_items=100, max_delay_ms=50) as buffer:
+        buffer.add("a")
+        deadline = time.monotonic() + 2
+        while not writer.batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert writer.batches == [["a"]]
+
+def test_close_with_nothing_buffered_writes_nothing():
+    """Closing an empty buffer never calls write"""
+    writer = RecordingWriter()
+    BulkWriteBuffer(writer).close()
+    assert writer.batches == []
+
+def test_add_after_close_raises():
+    """A closed buffer refuses new items instead of dropping them"""
+    buffer = BulkWriteBuffer(RecordingWriter())
+    buffer.close()
+    with pytest.raises(RuntimeError):
+        buffer.add("late")
+
+def test_failed_write_is_retried():
+    """A batch that fails and then succeeds is written once and counted"""
+    writer = RecordingWriter(failures=1)
+    with BulkWriteBuffer(writer, max_items=2, retries=1) as buffer:
+        buffer.add(1)
+        buffer.add(2)
+    assert writer.batches == [[1, 2]]
+    assert buffer.failed_items == []
+    assert buffer.flushed_items == 2
+
+def test_exhausted_retries_make_close_raise():
+    """A batch that keeps failing is kept aside, not counted, and reported on close"""
+    writer = RecordingWriter(failures=1)
+    buffer = BulkWriteBuffer(writer, max_items=2, retries=0)
+    buffer.add(1)
+    buffer.add(2)
+    buffer.add(3)
+    with pytest.raises(RuntimeError):
+        buffer.close()
+    assert writer.batches == [[3]]
+    assert buffer.failed_items == [1, 2]
+    assert buffer.flushed_items == 1
+    assert isinstance(buffer.last_error, ConnectionError)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for skill alias resolution in the skill registry
+"""
+
+from skills import SkillRegistry
+
+def test_exact_aliases_resolve_to_canonical_names():
+    """Spellings, abbreviations and punctuation variants map to one name"""
+    registry = SkillRegistry()
+    assert registry.canonicalize("React.js") == "react"
+    assert registry.canonicalize("reactjs") == "react"
+    assert registry.canonicalize("Vanilla JS") == "javascript"
+    assert registry.canonicalize("GitHub") == "git"
+    assert registry.canonicalize("golang") == "go"
+
+def test_qualifiers_and_versions_are_ignored():
+    """A single alias surrounded only by qualifiers or version numbers still resolves"""
+    registry = SkillRegistry()
+    assert registry.canonicalize("Python 3 programming") == "python"
+    assert registry.canonicalize("python v3.11") == "python"
+    assert registry.canonicalize("Advanced React") == "react"
+    assert registry.canonicalize("node.js (express)") == "node.js"
+
+def test_ambiguous_and_unknown_phrases_are_left_alone():
+    """Phrases naming several skills, or none, fall back to their normalized text"""
+    registry = SkillRegistry()
+    assert registry.canonicalize("React and Node") == "react and node"
+    assert registry.canonicalize("Quantum Basket Weaving") == "quantum basket weaving"
+    assert registry.canonicalize("   ") == ""
+
+def test_custom_aliases_replace_the_defaults():
+    """A registry built from its own table only knows that table"""
+    registry = SkillRegistry({"kotlin": ["kt"]})
+    assert registry.canonicalize("KT") == "kotlin"
+    assert registry.canonicalize("js") == "js"
+
+def test_add_alias_clears_cache_and_changes_version():
+    """Adding an alias invalidates cached resolutions and the alias-table version"""
+    registry = SkillRegistry({"kotlin": ["kt"]})
+    version = registry.version
+    assert registry.canonicalize("Jetpack Compose") == "jetpack compose"
+
+    registry.add_alias("jetpack compose", "kotlin")
+    assert registry.canonicalize("Jetpack Compose") == "kotlin"
+    assert registry.version != version
+
+def test_version_depends_only_on_the_alias_table():
+    """Registries with the same aliases agree on the version"""
+    assert SkillRegistry({"kotlin": ["kt"]}).version == SkillRegistry({"kotlin": ["kt"]}).version
+    assert SkillRegistry({"kotlin": ["kt"]}).version != SkillRegistry({"kotlin": []}).version